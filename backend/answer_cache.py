@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """LRU cache of generated answers looked up by query similarity.
+
+    An answer is reused for a later query in the same namespace whose
+    embedding has a cosine similarity of at least ``threshold`` with the
+    query it was generated for. Entries remember the namespace version
+    they were answered against, so an ingest into the namespace makes its
+    cached answers stale. Entries expire after ``ttl`` seconds and the
+    least recently used ones are evicted beyond ``max_entries``.
+    """
+
+    def __init__(self, threshold=0.95, max_entries=1000, ttl=3600):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # (namespace, query) -> (version, unit vector, answer, expiry)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, namespace, version, vector):
+        """Return the best cached answer for a query vector, or ``None``"""
+        vector = self._unit(vector)
+        now = time.monotonic()
+
+        with self._lock:
+            keys, vectors = [], []
+            for key, (entry_version, entry_vector, _, expiry) in list(self._entries.items()):
+                if key[0] != namespace:
+                    continue
+                if entry_version != version or expiry <= now:
+                    # Answered against older contents, or expired
+                    del self._entries[key]
+                    continue
+                keys.append(key)
+                vectors.append(entry_vector)
+
+            if vectors:
+                scores = np.vstack(vectors) @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self.hits += 1
+                    self._entries.move_to_end(keys[best])
+                    return self._entries[keys[best]][2]
+
+            self.misses += 1
+            return None
+
+    def put(self, namespace, version, query, vector, answer):
+        expiry = time.monotonic() + self.ttl
+        with self._lock:
+            key = (namespace, query)
+            self._entries[key] = (version, self._unit(vector), answer, expiry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,124 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class MicroBatcher:
+    """Collects concurrent calls into batches for a vectorised function.
+
+    Items submitted within ``window_ms`` of each other (or until
+    ``max_batch`` items are waiting) are passed to ``fn`` as a single list
+    on a worker thread, and each caller gets its own result back. ``fn``
+    must return one result per item, in order.
+    """
+
+    def __init__(self, fn, window_ms=5, max_batch=32, name="batch"):
+        self.fn = fn
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.batches = 0
+        self.items = 0
+        self._pending = []
+        self._timer = None
+        # One worker: while a batch runs, the next one keeps filling up
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch):
+        loop = asyncio.get_running_loop()
+        items = [item for item, _ in batch]
+        self.batches += 1
+        self.items += len(items)
+
+        try:
+            results = await loop.run_in_executor(self._executor, self.fn, items)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            # The caller may have been cancelled while the batch ran
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _search_batch(items):
+    """Run one FAISS search per index for a list of (index, vector, k)"""
+    results = [None] * len(items)
+    groups = {}
+    for pos, (index_manager, vector, k) in enumerate(items):
+        groups.setdefault(id(index_manager), (index_manager, []))[1].append(pos)
+
+    for index_manager, positions in groups.values():
+        queries = np.vstack([items[p][1] for p in positions]).astype(np.float32)
+        k_max = max(items[p][2] for p in positions)
+        found = index_manager.search(queries, k_max)
+
+        for row, p in enumerate(positions):
+            k = items[p][2]
+            if found is None:
+                results[p] = (np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64))
+            else:
+                scores, ids = found
+                results[p] = (scores[row, :k], ids[row, :k])
+
+    return results
+
+
+class QueryBatcher:
+    """Batches query encoding and index searches across concurrent requests"""
+
+    def __init__(self, encode_fn, window_ms=5, max_batch=32):
+        self._encoder = MicroBatcher(
+            encode_fn, window_ms, max_batch, name="query-encode"
+        )
+        self._searcher = MicroBatcher(
+            _search_batch, window_ms, max_batch, name="index-search"
+        )
+
+    async def encode(self, query):
+        return await self._encoder.submit(query)
+
+    async def search(self, index_manager, vector, k):
+        """Return ``(scores, ids)`` arrays for one query vector"""
+        return await self._searcher.submit((index_manager, vector, k))
+
+    def stats(self):
+        return {"encode": self._encoder.stats(), "search": self._searcher.stats()}
+
+    def shutdown(self):
+        self._encoder.shutdown()
+        self._searcher.shutdown()
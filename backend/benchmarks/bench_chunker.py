@@ -0,0 +1,77 @@
+"""Micro-benchmark: token-budget chunker vs. the original run_chunking loop.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_chunker --sentences 200000 --chunk-sizes 100 400 1600
+
+Sentence splitting is done once up front so only the chunking loops are
+timed.
+"""
+import argparse
+import random
+import time
+
+from chunker import chunk_sentences
+
+WORDS = (
+    "the index query vector chunk document retrieval model token page "
+    "search embedding answer context stream latency cache batch"
+).split()
+
+
+def legacy_chunking(sentences, chunk_size=400):
+    """The original loop: re-counts every word of the chunk after each sentence"""
+    chunks = []
+    current = []
+
+    for sent in sentences:
+        current.append(sent)
+        if sum(len(s.split()) for s in current) >= chunk_size:
+            chunks.append(" ".join(current))
+            current = []
+
+    if current:
+        chunks.append(" ".join(current))
+
+    return chunks
+
+
+def synthetic_sentences(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 30))) + "."
+        for _ in range(count)
+    ]
+
+
+def best_of(repeat, fn, *args):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sentences", type=int, default=100_000)
+    parser.add_argument("--chunk-sizes", type=int, nargs="+", default=[100, 400, 1600])
+    parser.add_argument("--overlap", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    sentences = synthetic_sentences(args.sentences)
+    paged = [(None, s) for s in sentences]
+    words = sum(len(s.split()) for s in sentences)
+    print(f"{len(sentences)} sentences, {words} words")
+    print(f"{'chunk_size':>10} {'legacy s':>10} {'new s':>10} {'speedup':>8}")
+
+    for size in args.chunk_sizes:
+        legacy = best_of(args.repeat, legacy_chunking, sentences, size)
+        new = best_of(args.repeat, chunk_sentences, paged, size, min(args.overlap, size - 1))
+        print(f"{size:>10} {legacy:>10.3f} {new:>10.3f} {legacy / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
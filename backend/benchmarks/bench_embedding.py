@@ -0,0 +1,116 @@
+"""Parity / throughput report for the embedding backends.
+
+Encodes the same synthetic chunks and queries with sentence-transformers
+(PyTorch) and with the ONNX Runtime backend in float32 and int8, then
+compares each ONNX variant against the PyTorch vectors: cosine similarity
+of the embeddings and recall@k of nearest-neighbour search. Run from the
+backend directory:
+
+    python -m benchmarks.bench_embedding --chunks 2000 --threads 4
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import Corpus
+from config import EMBEDDING_MODEL
+
+
+def load_engines(args, cache_dir):
+    """(name, model) pairs; the first one is the reference"""
+    from onnx_embedder import OnnxEmbedder
+
+    engines = []
+    try:
+        import torch
+        from sentence_transformers import SentenceTransformer
+        torch.set_num_threads(args.threads)
+        engines.append(("pytorch", SentenceTransformer(args.model, device="cpu")))
+    except ImportError:
+        print("sentence-transformers is not installed, comparing against ONNX float32")
+
+    for quantize in (False, True):
+        engines.append((
+            "onnx-int8" if quantize else "onnx-fp32",
+            OnnxEmbedder(
+                args.model, cache_dir, quantize=quantize,
+                threads=args.threads, batch_size=args.batch_size,
+            ),
+        ))
+    return engines
+
+
+def timed_encode(model, texts, batch_size):
+    start = time.perf_counter()
+    vectors = model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    elapsed = time.perf_counter() - start
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--min-words", type=int, default=20)
+    parser.add_argument("--max-words", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = Corpus(seed=args.seed)
+    rng = random.Random(args.seed)
+    # Mixed chunk lengths, like the tail chunks of real documents
+    chunks = [
+        corpus.document(rng.randint(args.min_words, args.max_words))
+        for _ in range(args.chunks)
+    ]
+    queries = [corpus.query(rng.choice(chunks)) for _ in range(args.queries)]
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        engines = load_engines(args, cache_dir)
+        results = []
+        for name, model in engines:
+            # One warm-up pass so lazy initialization is not measured
+            model.encode(chunks[:args.batch_size], batch_size=args.batch_size)
+            tokens = getattr(model, "tokens", 0), getattr(model, "padded_tokens", 0)
+
+            chunk_vectors, seconds = timed_encode(model, chunks, args.batch_size)
+            padding = None
+            if hasattr(model, "padded_tokens"):
+                # Share of the computed positions that were padding
+                padded = model.padded_tokens - tokens[1]
+                padding = 1 - (model.tokens - tokens[0]) / max(padded, 1)
+            query_vectors, _ = timed_encode(model, queries, args.batch_size)
+            results.append((name, chunk_vectors, query_vectors, seconds, padding))
+
+    reference, ref_chunks, ref_queries = results[0][:3]
+    truth = np.argsort(-(ref_queries @ ref_chunks.T), axis=1)[:, :args.k]
+
+    print(f"{args.model}: {args.chunks} chunks of {args.min_words}-{args.max_words} words, "
+          f"{args.queries} queries, {args.threads} threads, batch {args.batch_size}, "
+          f"parity vs {reference}")
+    print(f"{'engine':>10} {'chunks/s':>9} {'speedup':>8} {'cos mean':>9} {'cos min':>8} "
+          f"{'recall':>7} {'padding':>8}")
+
+    base_seconds = results[0][3]
+    for name, chunk_vectors, query_vectors, seconds, padding in results:
+        cosine = (chunk_vectors * ref_chunks).sum(axis=1)
+        found = np.argsort(-(query_vectors @ chunk_vectors.T), axis=1)[:, :args.k]
+        recall = np.mean([
+            len(np.intersect1d(found[i], truth[i])) / args.k for i in range(len(queries))
+        ])
+        padding = "-" if padding is None else f"{padding:.1%}"
+        print(f"{name:>10} {args.chunks / seconds:>9.1f} {base_seconds / seconds:>7.2f}x "
+              f"{cosine.mean():>9.4f} {cosine.min():>8.4f} {recall:>7.3f} {padding:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""End-to-end load benchmark against a stub LLM.
+
+Starts the stub Ollama server and the backend (uvicorn) as subprocesses,
+ingests a synthetic corpus through ``/v1/ingest`` and then drives
+``/v1/chat/completions`` with concurrent SSE clients. Embeddings use the
+download-free ``hash`` backend by default, so the whole run works offline
+on a CPU-only machine. Run from the backend directory:
+
+    python -m benchmarks.bench_load --docs 200 --clients 32 --requests 8
+
+Reports ingest throughput, server-side retrieval latency (from
+``/metrics``), client-side time-to-first-token and tokens/s.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+import numpy as np
+
+from benchmarks.synthetic import Corpus
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(port, args):
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.stub_ollama",
+            "--port", str(port),
+            "--tokens", str(args.tokens),
+            "--tokens-per-second", str(args.tokens_per_second),
+            "--prompt-ms", str(args.prompt_ms),
+        ],
+        cwd=BACKEND_DIR,
+    )
+
+
+def start_server(port, llm_ports, workdir, args):
+    env = dict(
+        os.environ,
+        PYTHONPATH=BACKEND_DIR,
+        MINDSEARCH_LLM_BACKENDS=",".join(f"http://127.0.0.1:{p}" for p in llm_ports),
+        MINDSEARCH_DATA_DIR=os.path.join(workdir, "data"),
+        MINDSEARCH_EMBEDDING_BACKEND=args.embedding_backend,
+        MINDSEARCH_LLM_CONCURRENCY=str(args.llm_concurrency),
+        MINDSEARCH_LLM_MAX_QUEUED=str(max(args.clients * 2, 64)),
+    )
+    if not args.caches:
+        # Measure the full path on every request
+        env.update(MINDSEARCH_ANSWER_CACHE="0", MINDSEARCH_RETRIEVAL_CACHE="0")
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning",
+        ],
+        cwd=workdir,
+        env=env,
+    )
+
+
+async def wait_ready(session, url, process, timeout=300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode}")
+        try:
+            async with session.get(url) as resp:
+                if resp.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit(f"Server did not come up: {url}")
+
+
+def parse_histogram(text, name):
+    """Cumulative ``(upper bound, count)`` buckets of a histogram in /metrics"""
+    buckets = []
+    prefix = f'{name}_bucket{{le="'
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            bound, count = line[len(prefix):].split('"} ')
+            buckets.append((float(bound), float(count)))
+    return buckets
+
+
+def histogram_quantile(before, after, q):
+    """Quantile of the observations between two scrapes, interpolated
+    linearly within a bucket like Prometheus does"""
+    buckets = [(bound, a - b) for (bound, a), (_, b) in zip(after, before)]
+    if not buckets or buckets[-1][1] == 0:
+        return float("nan")
+    rank = q * buckets[-1][1]
+    lower, below = 0.0, 0.0
+    for bound, cumulative in buckets:
+        if cumulative >= rank:
+            if bound == float("inf"):
+                return lower
+            return lower + (bound - lower) * (rank - below) / max(cumulative - below, 1)
+        lower, below = bound, cumulative
+    return lower
+
+
+async def ingest(session, base, paths, files_per_upload):
+    """Upload the corpus and wait for every ingest job, return (seconds, chunks)"""
+    start = time.perf_counter()
+    jobs = []
+    for i in range(0, len(paths), files_per_upload):
+        form = aiohttp.FormData()
+        form.add_field("session_id", "bench")
+        for path in paths[i:i + files_per_upload]:
+            with open(path, "rb") as f:
+                form.add_field("files", f.read(), filename=os.path.basename(path))
+        async with session.post(f"{base}/v1/ingest", data=form) as resp:
+            resp.raise_for_status()
+            jobs.append((await resp.json())["job_id"])
+
+    chunks = 0
+    for job_id in jobs:
+        while True:
+            async with session.get(f"{base}/v1/ingest/{job_id}") as resp:
+                status = await resp.json()
+            if status["status"] in ("done", "failed"):
+                chunks += status["chunks_total"]
+                break
+            await asyncio.sleep(0.1)
+    return time.perf_counter() - start, chunks
+
+
+async def chat(session, base, query, user):
+    """One streamed chat request, returns its timings or an error string"""
+    payload = {
+        "messages": [{"role": "user", "content": query}],
+        "stream": True,
+        # The namespace the corpus was ingested into
+        "session_id": "bench",
+    }
+    headers = {"X-OpenWebUI-User-Id": f"user-{user}"}
+    start = time.perf_counter()
+    first = None
+    tokens = 0
+
+    async with session.post(f"{base}/v1/chat/completions", json=payload, headers=headers) as resp:
+        if resp.status == 429:
+            return "rejected"
+        if resp.status != 200:
+            return "failed"
+        async for line in resp.content:
+            line = line.decode("utf-8").strip()
+            if not line.startswith('data: {"choices"'):
+                continue
+            if first is None:
+                first = time.perf_counter()
+            # The stub answers with space separated tokens
+            tokens += line.count("tok")
+
+    end = time.perf_counter()
+    if first is None:
+        return "failed"
+    return {
+        "ttft": first - start,
+        "total": end - start,
+        "tokens": tokens,
+        "tokens_per_s": tokens / (end - first) if end > first else float("nan"),
+    }
+
+
+async def run(args):
+    corpus = Corpus(args.vocabulary, seed=args.seed)
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        paths, texts = corpus.write(os.path.join(workdir, "corpus"), args.docs, args.words)
+
+        llm_ports, port = [free_port() for _ in range(args.llm_backends)], free_port()
+        stubs = [start_stub(p, args) for p in llm_ports]
+        server = start_server(port, llm_ports, workdir, args)
+        base = f"http://127.0.0.1:{port}"
+
+        try:
+            timeout = aiohttp.ClientTimeout(total=None)
+            connector = aiohttp.TCPConnector(limit=0)
+            async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+                for llm_port, stub in zip(llm_ports, stubs):
+                    await wait_ready(session, f"http://127.0.0.1:{llm_port}/api/version", stub)
+                await wait_ready(session, f"{base}/v1/namespaces/stats", server)
+
+                seconds, chunks = await ingest(session, base, paths, args.files_per_upload)
+                print(f"ingest: {args.docs} docs ({args.words} words each), {chunks} chunks "
+                      f"in {seconds:.1f} s -> {args.docs / seconds:.1f} docs/s, "
+                      f"{chunks / seconds:.1f} chunks/s")
+
+                async with session.get(f"{base}/metrics") as resp:
+                    before = await resp.text()
+
+                async def client(user):
+                    results = []
+                    for _ in range(args.requests):
+                        query = corpus.query(rng.choice(texts))
+                        results.append(await chat(session, base, query, user))
+                    return results
+
+                start = time.perf_counter()
+                per_client = await asyncio.gather(*[client(u) for u in range(args.clients)])
+                elapsed = time.perf_counter() - start
+
+                async with session.get(f"{base}/metrics") as resp:
+                    after = await resp.text()
+        finally:
+            for process in [server, *stubs]:
+                process.terminate()
+            for process in [server, *stubs]:
+                process.wait()
+
+    results = [r for rs in per_client for r in rs]
+    done = [r for r in results if isinstance(r, dict)]
+    rejected = results.count("rejected")
+    failed = results.count("failed")
+    total_tokens = sum(r["tokens"] for r in done)
+
+    print(f"chat: {len(results)} requests from {args.clients} clients in {elapsed:.1f} s "
+          f"({len(done) / elapsed:.1f} req/s), {rejected} rejected, {failed} failed")
+    if not done:
+        return
+
+    retrieval = (
+        parse_histogram(before, "mindsearch_retrieval_seconds"),
+        parse_histogram(after, "mindsearch_retrieval_seconds"),
+    )
+    ttft = np.array([r["ttft"] for r in done])
+    total = np.array([r["total"] for r in done])
+    rates = np.array([r["tokens_per_s"] for r in done])
+
+    print(f"{'':>24} {'p50':>9} {'p99':>9}")
+    print(f"{'retrieval ms (server)':>24} "
+          f"{histogram_quantile(*retrieval, 0.5) * 1000:>9.1f} "
+          f"{histogram_quantile(*retrieval, 0.99) * 1000:>9.1f}")
+    print(f"{'ttft ms (client)':>24} {np.percentile(ttft, 50) * 1000:>9.1f} "
+          f"{np.percentile(ttft, 99) * 1000:>9.1f}")
+    print(f"{'request s':>24} {np.percentile(total, 50):>9.2f} {np.percentile(total, 99):>9.2f}")
+    print(f"{'tokens/s per stream':>24} {np.percentile(rates, 50):>9.1f} "
+          f"{np.percentile(rates, 1):>9.1f}  (p1)")
+    print(f"aggregate: {total_tokens / elapsed:.1f} tokens/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=100)
+    parser.add_argument("--words", type=int, default=1000, help="words per document")
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--files-per-upload", type=int, default=10)
+    parser.add_argument("--clients", type=int, default=16, help="concurrent SSE clients")
+    parser.add_argument("--requests", type=int, default=4, help="chat requests per client")
+    parser.add_argument("--tokens", type=int, default=128, help="tokens per stub answer")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0,
+                        help="stub decode speed per stream")
+    parser.add_argument("--prompt-ms", type=float, default=50.0,
+                        help="stub prompt evaluation delay")
+    parser.add_argument("--llm-backends", type=int, default=1,
+                        help="stub Ollama servers in the backend pool")
+    parser.add_argument("--llm-concurrency", type=int, default=4,
+                        help="MINDSEARCH_LLM_CONCURRENCY of the server under test")
+    parser.add_argument("--embedding-backend", default="hash")
+    parser.add_argument("--caches", action="store_true",
+                        help="keep the answer and retrieval caches enabled")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Recall / memory report for the index storage options.
+
+Builds the same corpus with every MINDSEARCH_INDEX_STORAGE setting and
+compares each against exact float32 search. Run from the backend
+directory, either on a synthetic corpus or on the vectors of an existing
+namespace:
+
+    python -m benchmarks.bench_quantization --vectors 100000
+    python -m benchmarks.bench_quantization --namespace data/<namespace>
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from index_manager import IndexManager, STORAGE_TYPES, normalized
+from vector_store import VectorStore
+
+
+def synthetic_corpus(count, dim, queries, seed=0):
+    """Clustered Gaussian vectors, closer to real embeddings than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(count // 200, 1), dim)).astype(np.float32)
+
+    def sample(n):
+        picks = rng.integers(0, len(centers), n)
+        return centers[picks] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+
+    return sample(count), sample(queries)
+
+
+def namespace_corpus(path, dim, queries, seed=0):
+    loaded = VectorStore(os.path.join(path, "faiss.vectors")).load(dim)
+    if loaded is None:
+        raise SystemExit(f"No stored vectors under {path}")
+    vectors = np.asarray(loaded[0])
+    rng = np.random.default_rng(seed)
+    # Held-out perturbed corpus vectors stand in for real queries
+    picks = rng.choice(len(vectors), size=min(queries, len(vectors)), replace=False)
+    noise = 0.05 * rng.standard_normal((len(picks), dim)).astype(np.float32)
+    return vectors, vectors[picks] + noise
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--namespace", help="namespace directory to read vectors from")
+    parser.add_argument("--vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index-type", default="flat")
+    args = parser.parse_args()
+
+    if args.namespace:
+        corpus, queries = namespace_corpus(args.namespace, args.dim, args.queries)
+    else:
+        corpus, queries = synthetic_corpus(args.vectors, args.dim, args.queries)
+
+    exact = normalized(queries) @ normalized(corpus).T
+    truth = np.argsort(-exact, axis=1)[:, :args.k]
+    ids = np.arange(len(corpus))
+
+    print(f"{len(corpus)} vectors, dim {corpus.shape[1]}, {len(queries)} queries, "
+          f"index type {args.index_type}, recall@{args.k} vs exact float32")
+    print(f"{'storage':>8} {'recall':>7} {'bytes/vec':>10} {'memory MB':>10} {'query ms':>9}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for storage in STORAGE_TYPES:
+            manager = IndexManager(
+                os.path.join(tmp, storage, "faiss.index"),
+                index_type=args.index_type,
+                storage=storage,
+            )
+            manager.add(corpus, ids)
+
+            start = time.perf_counter()
+            _, found = manager.search(queries, args.k)
+            elapsed = (time.perf_counter() - start) / len(queries)
+
+            recall = np.mean([
+                len(np.intersect1d(found[i], truth[i])) / args.k
+                for i in range(len(queries))
+            ])
+            memory = manager.memory_usage()
+            print(f"{storage:>8} {recall:>7.3f} {memory / len(corpus):>10.1f} "
+                  f"{memory / 2**20:>10.1f} {elapsed * 1000:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
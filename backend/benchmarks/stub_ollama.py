@@ -0,0 +1,92 @@
+"""Stub Ollama server for benchmarks.
+
+Speaks the streaming ``/api/generate`` protocol (NDJSON chunks ending with
+a ``done`` chunk that carries ``context`` and eval statistics) at a fixed
+token rate, after a simulated prompt evaluation delay. Prompt words
+already covered by a ``context`` sent back by the client are not charged
+again, like a real prefix cache. Run from the backend directory:
+
+    python -m benchmarks.stub_ollama --port 11435 --tokens 128 --tokens-per-second 40
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from aiohttp import web
+
+
+def build_app(tokens=128, tokens_per_second=40.0, prompt_ms=50.0, prompt_ms_per_1k=100.0):
+    """Return the stub application with the given generation profile"""
+
+    async def generate(request):
+        body = await request.json()
+        prompt_words = len(body.get("prompt", "").split())
+        context = body.get("context") or []
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+
+        start = time.perf_counter()
+        await asyncio.sleep((prompt_ms + prompt_ms_per_1k * prompt_words / 1000) / 1000)
+        prompt_done = time.perf_counter()
+
+        interval = 1.0 / tokens_per_second
+        try:
+            for i in range(tokens):
+                # Pace against the start time so sleeps do not accumulate drift
+                delay = prompt_done + i * interval - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                chunk = {"model": body.get("model"), "response": f"tok{i} ", "done": False}
+                await response.write((json.dumps(chunk) + "\n").encode())
+
+            end = time.perf_counter()
+            final = {
+                "model": body.get("model"),
+                "response": "",
+                "done": True,
+                "context": context + list(range(prompt_words + tokens)),
+                "prompt_eval_count": prompt_words,
+                "prompt_eval_duration": int((prompt_done - start) * 1e9),
+                "eval_count": tokens,
+                "eval_duration": int((end - prompt_done) * 1e9),
+                "total_duration": int((end - start) * 1e9),
+            }
+            await response.write((json.dumps(final) + "\n").encode())
+        except ConnectionResetError:
+            # The client went away, as a real server would we stop generating
+            pass
+        return response
+
+    async def version(request):
+        return web.json_response({"version": "stub"})
+
+    async def tags(request):
+        return web.json_response({"models": []})
+
+    app = web.Application()
+    app.router.add_post("/api/generate", generate)
+    app.router.add_get("/api/version", version)
+    app.router.add_get("/api/tags", tags)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--tokens", type=int, default=128, help="tokens per answer")
+    parser.add_argument("--tokens-per-second", type=float, default=40.0)
+    parser.add_argument("--prompt-ms", type=float, default=50.0,
+                        help="fixed prompt evaluation delay")
+    parser.add_argument("--prompt-ms-per-1k", type=float, default=100.0,
+                        help="extra prompt evaluation delay per 1000 prompt words")
+    args = parser.parse_args()
+
+    app = build_app(args.tokens, args.tokens_per_second, args.prompt_ms, args.prompt_ms_per_1k)
+    web.run_app(app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Synthetic documents and queries for benchmarks.
+
+Words are drawn from a Zipf-distributed vocabulary of made-up words, so
+corpora of any size can be generated offline and reproducibly, with the
+skewed term frequencies of real text.
+"""
+import os
+import random
+
+_SYLLABLES = (
+    "ka ri mo ten shu lo va ne pi ro sa du mi ko te ra zu bo fe li na go "
+    "ha ju we yo xi qu"
+).split()
+
+
+def vocabulary(size, seed=0):
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(1, 4))))
+    return sorted(words)
+
+
+class Corpus:
+    """Generates documents and matching queries from one vocabulary"""
+
+    def __init__(self, vocab_size=20000, seed=0):
+        self.words = vocabulary(vocab_size, seed)
+        self.rng = random.Random(seed)
+        # Zipf weights: the n-th most common word has frequency ~ 1/n
+        self.weights = [1.0 / rank for rank in range(1, len(self.words) + 1)]
+
+    def sentence(self, min_words=8, max_words=20):
+        words = self.rng.choices(self.words, self.weights, k=self.rng.randint(min_words, max_words))
+        return " ".join(words).capitalize() + "."
+
+    def document(self, words=1000):
+        sentences, count = [], 0
+        while count < words:
+            sentence = self.sentence()
+            sentences.append(sentence)
+            count += len(sentence.split())
+        # A paragraph break every few sentences
+        return "\n\n".join(
+            " ".join(sentences[i:i + 6]) for i in range(0, len(sentences), 6)
+        )
+
+    def query(self, document, min_words=3, max_words=8):
+        """A question built from a random stretch of a document"""
+        words = document.replace("\n", " ").split()
+        length = self.rng.randint(min_words, max_words)
+        start = self.rng.randrange(max(len(words) - length, 1))
+        return "What about " + " ".join(words[start:start + length]).rstrip(".") + "?"
+
+    def write(self, directory, docs, words=1000):
+        """Write ``docs`` text files and return their paths and contents"""
+        os.makedirs(directory, exist_ok=True)
+        paths, texts = [], []
+        for i in range(docs):
+            text = self.document(words)
+            path = os.path.join(directory, f"doc_{i:05d}.txt")
+            with open(path, "w", encoding="utf-8") as out:
+                out.write(text)
+            paths.append(path)
+            texts.append(text)
+        return paths, texts
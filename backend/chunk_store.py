@@ -0,0 +1,102 @@
+import json
+import os
+import threading
+
+from locks import file_lock
+
+
+class ChunkStore:
+    """Append-only chunk store backed by a JSON Lines file.
+
+    Every chunk gets a stable integer ID which doubles as its vector ID in
+    the FAISS index, so new documents can be added without renumbering or
+    rewriting anything that was ingested before. Appends hold a file lock,
+    so processes sharing the store never hand out the same IDs.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        # Documents with chunks in the store
+        self.sources = set()
+        self.next_id = 0
+        self.nbytes = 0
+        self._offset = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """Read records appended since the last load"""
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, "r", encoding="utf-8") as f:
+            f.seek(self._offset)
+            for line in iter(f.readline, ""):
+                if not line.endswith("\n"):
+                    # Another process is still writing this record
+                    break
+                self._offset = f.tell()
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                self.records[record["id"]] = record
+                self.sources.add(record.get("source"))
+                self.nbytes += len(line)
+
+        if self.records:
+            self.next_id = max(self.records) + 1
+
+    def refresh(self):
+        """Pick up chunks appended to the file by other worker processes"""
+        with self._lock:
+            self._load()
+
+    def add(self, texts, source=None, metadata=None):
+        """Append chunks and return their newly assigned IDs.
+
+        ``metadata`` is an optional list of dicts (one per chunk, e.g. the
+        source pages) stored alongside each chunk's text.
+        """
+        metadata = metadata or [{}] * len(texts)
+        with self._lock, file_lock(f"{self.path}.lock"):
+            self._load()
+            ids = list(range(self.next_id, self.next_id + len(texts)))
+            records = [
+                {"id": chunk_id, "text": text, "source": source, **meta}
+                for chunk_id, text, meta in zip(ids, texts, metadata)
+            ]
+
+            with open(self.path, "a", encoding="utf-8") as out:
+                for record in records:
+                    line = json.dumps(record) + "\n"
+                    out.write(line)
+                    self.nbytes += len(line)
+                self._offset = out.tell()
+
+            for record in records:
+                self.records[record["id"]] = record
+            self.sources.add(source)
+            self.next_id += len(texts)
+
+        return ids
+
+    def get(self, chunk_id):
+        chunk_id = int(chunk_id)
+        if chunk_id >= self.next_id:
+            self.refresh()
+        return self.records.get(chunk_id)
+
+    def has_source(self, source):
+        """Whether chunks of ``source`` were stored, here or by another process"""
+        if source not in self.sources:
+            self.refresh()
+        return source in self.sources
+
+    def get_text(self, chunk_id):
+        record = self.get(chunk_id)
+        return record["text"] if record else None
+
+    def __len__(self):
+        return len(self.records)
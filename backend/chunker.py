@@ -1,25 +1,54 @@
-import nltk
-from nltk.tokenize import sent_tokenize
+from collections import deque
+from functools import lru_cache
+import math
 import os
+import re
 import chardet
-import pdfplumber
-from docx import Document
 
-# Download required NLTK data
-try:
-    nltk.data.find('tokenizers/punkt_tab')
-except LookupError:
-    nltk.download('punkt_tab', quiet=True)
+from metrics import Histogram
+from resources import LazyResource
 
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt', quiet=True)
+# Pages per task when a PDF is extracted in parallel
+PDF_PAGES_PER_TASK = 16
 
-def extract_text_from_file(file_path):
+EXTRACT_SECONDS = Histogram(
+    "mindsearch_extract_seconds", "Time to extract the text of one document"
+)
+CHUNK_SECONDS = Histogram(
+    "mindsearch_chunk_seconds", "Time to split one document into chunks"
+)
+
+def load_punkt():
+    """Import NLTK's sentence tokenizer, downloading the punkt data if missing"""
+    import nltk
+    from nltk.tokenize import sent_tokenize
+
+    for name in ('punkt_tab', 'punkt'):
+        try:
+            nltk.data.find(f'tokenizers/{name}')
+        except LookupError:
+            nltk.download(name, quiet=True)
+    return sent_tokenize
+
+punkt = LazyResource("punkt", load_punkt)
+
+# Used when the punkt data is missing (e.g. offline) and could not be downloaded
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_punkt_available = True
+
+def split_sentences(text):
+    """Split text into sentences with NLTK punkt, or on end punctuation"""
+    global _punkt_available
+    if _punkt_available:
+        try:
+            return punkt.get()(text)
+        except LookupError:
+            _punkt_available = False
+    return [s for s in _SENTENCE_END.split(text) if s.strip()]
+
+def extract_text_from_file(file_path, file_type=None):
     """Extract text from various file formats"""
-    _, ext = os.path.splitext(file_path)
-    ext = ext.lower()
+    ext = _file_type(file_path, file_type)
     
     try:
         if ext == '.pdf':
@@ -37,18 +66,68 @@ def extract_text_from_file(file_path):
 
 def extract_text_from_pdf(file_path):
     """Extract text from PDF files"""
+    return "\n".join(text for _, text in extract_pages_from_pdf(file_path))
+
+def count_pdf_pages(file_path):
+    import pdfplumber
+    with pdfplumber.open(file_path) as pdf:
+        return len(pdf.pages)
+
+def extract_pdf_page_range(file_path, start, end):
+    """Extract (page number, text) pairs for pages [start, end) of a PDF"""
+    import pdfplumber
+    with pdfplumber.open(file_path) as pdf:
+        return [
+            (number + 1, pdf.pages[number].extract_text() or "")
+            for number in range(start, min(end, len(pdf.pages)))
+        ]
+
+def extract_pages_from_pdf(file_path, executor=None, pages_per_task=PDF_PAGES_PER_TASK):
+    """Extract (page number, text) pairs from a PDF.
+
+    With an executor, page ranges are extracted in parallel and reassembled
+    in page order; otherwise pages are read one after another.
+    """
     try:
-        text = ""
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                text += page.extract_text() or ""
-        return text
+        if executor is None:
+            return extract_pdf_page_range(file_path, 0, count_pdf_pages(file_path))
+
+        page_count = executor.submit(count_pdf_pages, file_path).result()
+        futures = [
+            executor.submit(extract_pdf_page_range, file_path, start, start + pages_per_task)
+            for start in range(0, page_count, pages_per_task)
+        ]
+        return [page for future in futures for page in future.result()]
     except Exception as e:
         print(f"Error reading PDF: {str(e)}")
-        return ""
+        return []
+
+def _file_type(file_path, file_type=None):
+    # Uploads are stored without extension, their type is passed along
+    if file_type is None:
+        file_type = os.path.splitext(file_path)[1]
+    return file_type.lower()
+
+def extract_pages_from_file(file_path, executor=None, file_type=None):
+    """Extract (page number, text) pairs; non-paginated formats give one page.
+
+    The format is told by ``file_type`` (an extension such as ``".pdf"``),
+    or by the path's extension.
+    """
+    with EXTRACT_SECONDS.time():
+        file_type = _file_type(file_path, file_type)
+        if file_type == '.pdf':
+            return extract_pages_from_pdf(file_path, executor)
+
+        if executor is None:
+            text = extract_text_from_file(file_path, file_type)
+        else:
+            text = executor.submit(extract_text_from_file, file_path, file_type).result()
+        return [(None, text)] if text else []
 
 def extract_text_from_docx(file_path):
     """Extract text from DOCX files"""
+    from docx import Document
     try:
         doc = Document(file_path)
         text = "\n".join([para.text for para in doc.paragraphs])
@@ -79,24 +158,137 @@ def extract_text_from_txt(file_path):
             with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
                 return f.read()
 
-def run_chunking(file_path, chunk_size=400):
-    """Chunk text from various file formats"""
-    text = extract_text_from_file(file_path)
-    
-    if not text:
-        return []
-    
-    sentences = sent_tokenize(text)
+@lru_cache(maxsize=None)
+def tokenizer_resource(name):
+    """A Hugging Face tokenizer, loaded once per process on first use"""
+    def load():
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(name)
+    return LazyResource(f"tokenizer:{name}", load)
+
+def token_functions(tokenizer, tokens_per_word=1.0):
+    """Return (count, encode, decode) helpers for whitespace words or a real tokenizer.
+
+    ``encode`` turns text into a list of tokens that can be sliced and
+    turned back into text with ``decode``. Without a tokenizer, tokens are
+    words and ``count`` estimates them as words times ``tokens_per_word``
+    (rounded up).
+    """
+    if tokenizer is None:
+        def count(text):
+            return math.ceil(len(text.split()) * tokens_per_word)
+
+        def encode(text):
+            return text.split()
+
+        def decode(tokens):
+            return " ".join(tokens)
+    else:
+        # The tokenizer is only loaded once text is first counted
+        resource = tokenizer_resource(tokenizer)
+
+        def count(text):
+            return len(encode(text))
+
+        def encode(text):
+            return resource.get().encode(text, add_special_tokens=False)
+
+        def decode(tokens):
+            return resource.get().decode(tokens)
+
+    return count, encode, decode
+
+def chunk_sentences(sentences, chunk_size=400, overlap=0, tokenizer=None):
+    """Pack (page number, sentence) pairs into chunks of at most chunk_size tokens.
+
+    Token counts are computed once per sentence and kept as a running total,
+    so chunking is linear in the length of the text. Each chunk repeats the
+    trailing ``overlap`` tokens of the previous one, cutting into a sentence
+    when the last one is longer than that. Sentences longer than the budget
+    are split: the first piece fills the current chunk and the rest follow
+    with a stride of ``chunk_size - overlap``, so they overlap like any
+    other chunks. Tokens are whitespace words unless ``tokenizer`` names a
+    Hugging Face tokenizer.
+    """
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("overlap must be at least 0 and smaller than chunk_size")
+
+    count, encode, decode = token_functions(tokenizer)
     chunks = []
-    current = []
+    window = deque()  # (page, sentence or piece of one, tokens)
+    window_tokens = 0
+    fresh = False  # the window holds text not yet emitted in any chunk
+
+    def flush():
+        page_numbers = sorted({p for p, _, _ in window if p is not None})
+        chunks.append({"text": " ".join(s for _, s, _ in window), "pages": page_numbers})
+
+    def carry(size):
+        """Keep only the last ``size`` tokens of the window"""
+        nonlocal window_tokens
+        while window and window_tokens - window[0][2] >= size:
+            window_tokens -= window.popleft()[2]
+        if window and window_tokens > size:
+            # Cut into the oldest sentence left
+            page, text, tokens = window.popleft()
+            window_tokens -= tokens
+            units = encode(text)
+            tail = units[len(units) - (size - window_tokens):]
+            window.appendleft((page, decode(tail), len(tail)))
+            window_tokens += len(tail)
 
-    for sent in sentences:
-        current.append(sent)
-        if sum(len(s.split()) for s in current) >= chunk_size:
-            chunks.append(" ".join(current))
-            current = []
+    def append(page, text, tokens):
+        nonlocal window_tokens, fresh
+        window.append((page, text, tokens))
+        window_tokens += tokens
+        fresh = True
 
-    if current:
-        chunks.append(" ".join(current))
+    for page, sent in sentences:
+        tokens = count(sent)
+        if tokens <= chunk_size:
+            if window_tokens + tokens > chunk_size:
+                if fresh:
+                    flush()
+                    fresh = False
+                # Repeat as much of the tail as fits next to the sentence
+                carry(min(overlap, chunk_size - tokens))
+            append(page, sent, tokens)
+            continue
+
+        # Too long for one chunk: the first piece fills the current window
+        rest = encode(sent)
+        while True:
+            room = chunk_size - window_tokens
+            piece, rest = rest[:room], rest[room:]
+            if piece:
+                append(page, decode(piece), len(piece))
+            if not rest:
+                break
+            flush()
+            fresh = False
+            carry(overlap)
+
+    if fresh:
+        flush()
 
     return chunks
+
+def chunk_pages(pages, chunk_size=400, overlap=0, tokenizer=None):
+    """Chunk (page number, text) pairs into dicts with text and source pages"""
+    with CHUNK_SECONDS.time():
+        sentences = [
+            (page, sent)
+            for page, text in pages
+            for sent in split_sentences(text)
+        ]
+        return chunk_sentences(sentences, chunk_size, overlap, tokenizer)
+
+def run_chunking(file_path, chunk_size=400, overlap=0, tokenizer=None):
+    """Chunk text from various file formats"""
+    pages = extract_pages_from_file(file_path)
+    
+    if not pages:
+        return []
+    
+    chunks = chunk_pages(pages, chunk_size, overlap, tokenizer)
+    return [chunk["text"] for chunk in chunks]
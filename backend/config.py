@@ -0,0 +1,201 @@
+import os
+
+# Backend settings, overridable through environment variables
+
+
+def env_flag(name, default=False):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# ----- Embeddings -----
+EMBEDDING_MODEL = os.getenv("MINDSEARCH_EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+# "sentence-transformers", "onnx" for the same model on ONNX Runtime (CPU),
+# or "hash" for download-free feature hashing (benchmarks, offline
+# development) with EMBEDDING_DIM dimensions
+EMBEDDING_BACKEND = os.getenv("MINDSEARCH_EMBEDDING_BACKEND", "sentence-transformers")
+EMBEDDING_DIM = int(os.getenv("MINDSEARCH_EMBEDDING_DIM", "384"))
+
+# ONNX backend: int8 dynamic quantization of the weights, ONNX Runtime
+# threads per process (0: the cores shared out between the ingest
+# processes) and texts per forward pass
+EMBEDDING_ONNX_QUANTIZE = env_flag("MINDSEARCH_EMBEDDING_ONNX_QUANTIZE", True)
+EMBEDDING_ONNX_THREADS = int(os.getenv("MINDSEARCH_EMBEDDING_ONNX_THREADS", "0"))
+EMBEDDING_ONNX_BATCH_SIZE = int(os.getenv("MINDSEARCH_EMBEDDING_ONNX_BATCH_SIZE", "32"))
+
+# Skip re-encoding chunks whose text was embedded before
+EMBEDDING_CACHE = env_flag("MINDSEARCH_EMBEDDING_CACHE", True)
+
+# Load the embedding model, NLTK punkt and tokenizers in the background at
+# startup (GET /ready answers 503 until they are in); otherwise each is
+# loaded on first use
+WARM_UP = env_flag("MINDSEARCH_WARM_UP", True)
+
+# Concurrent chat queries are encoded and searched together: a batch is
+# flushed after this many milliseconds or once it holds QUERY_BATCH_MAX queries
+QUERY_BATCH_WINDOW_MS = float(os.getenv("MINDSEARCH_QUERY_BATCH_WINDOW_MS", "5"))
+QUERY_BATCH_MAX = int(os.getenv("MINDSEARCH_QUERY_BATCH_MAX", "32"))
+
+# Fuse dense hits with BM25 keyword hits (reciprocal rank fusion)
+HYBRID_RETRIEVAL = env_flag("MINDSEARCH_HYBRID_RETRIEVAL", True)
+
+# Each BM25 update is written as a small segment file; beyond this many the
+# segments are merged into the namespace's base file
+BM25_MAX_SEGMENTS = int(os.getenv("MINDSEARCH_BM25_MAX_SEGMENTS", "32"))
+
+# Reuse the answer to an earlier query of the same namespace whose embedding
+# has at least this cosine similarity; entries expire after the TTL (seconds)
+ANSWER_CACHE = env_flag("MINDSEARCH_ANSWER_CACHE", True)
+ANSWER_CACHE_THRESHOLD = float(os.getenv("MINDSEARCH_ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_SIZE = int(os.getenv("MINDSEARCH_ANSWER_CACHE_SIZE", "1000"))
+ANSWER_CACHE_TTL = float(os.getenv("MINDSEARCH_ANSWER_CACHE_TTL", "3600"))
+
+# Candidate chunks retrieved per query, of which context packing keeps
+# the relevant, non-redundant ones that fit in the prompt
+RETRIEVAL_K = int(os.getenv("MINDSEARCH_RETRIEVAL_K", "20"))
+
+# Context packing: maximal marginal relevance trade-off (0 = relevance
+# only), minimum cosine similarity to the query, similarity above which a
+# chunk counts as a duplicate of one already packed, and tokens left free
+# in the LLM context window for the answer
+CONTEXT_DIVERSITY = float(os.getenv("MINDSEARCH_CONTEXT_DIVERSITY", "0.3"))
+CONTEXT_MIN_SCORE = float(os.getenv("MINDSEARCH_CONTEXT_MIN_SCORE", "0.2"))
+CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("MINDSEARCH_CONTEXT_DUPLICATE_THRESHOLD", "0.95"))
+CONTEXT_ANSWER_TOKENS = int(os.getenv("MINDSEARCH_CONTEXT_ANSWER_TOKENS", "1024"))
+
+# Memoize the chunk IDs retrieved for (query, k, namespace version)
+RETRIEVAL_CACHE = env_flag("MINDSEARCH_RETRIEVAL_CACHE", True)
+RETRIEVAL_CACHE_SIZE = int(os.getenv("MINDSEARCH_RETRIEVAL_CACHE_SIZE", "2048"))
+
+# ----- LLM -----
+# Ollama server (same variable the ollama CLI uses)
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+
+# Comma separated Ollama servers to spread generations over; each request
+# goes to the healthy one with the fewest requests in flight
+LLM_BACKENDS = [
+    host.strip()
+    for host in os.getenv("MINDSEARCH_LLM_BACKENDS", OLLAMA_HOST).split(",")
+    if host.strip()
+]
+
+# Model answering chat requests (must be pulled on every backend)
+LLM_MODEL = os.getenv("MINDSEARCH_LLM_MODEL", "llama3:8b")
+
+# Backends are probed every LLM_HEALTH_INTERVAL seconds; one failing
+# LLM_BREAKER_FAILURES times in a row gets no requests for
+# LLM_BREAKER_COOLDOWN seconds, after which a single request may try it again
+LLM_HEALTH_INTERVAL = float(os.getenv("MINDSEARCH_LLM_HEALTH_INTERVAL", "10"))
+LLM_BREAKER_FAILURES = int(os.getenv("MINDSEARCH_LLM_BREAKER_FAILURES", "3"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("MINDSEARCH_LLM_BREAKER_COOLDOWN", "30"))
+
+# Pooled keep-alive connections to Ollama and the per-read timeout in seconds
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("MINDSEARCH_OLLAMA_MAX_CONNECTIONS", "100"))
+OLLAMA_READ_TIMEOUT = float(os.getenv("MINDSEARCH_OLLAMA_READ_TIMEOUT", "300"))
+
+# Context window requested from the model; the prompt is packed to fit it
+LLM_NUM_CTX = int(os.getenv("MINDSEARCH_LLM_NUM_CTX", "4096"))
+
+# Generations run at once (OLLAMA_NUM_PARALLEL summed over the backends) and
+# requests allowed to wait for a slot; beyond that chat requests get HTTP 429
+LLM_CONCURRENCY = int(os.getenv("MINDSEARCH_LLM_CONCURRENCY", "2"))
+LLM_MAX_QUEUED = int(os.getenv("MINDSEARCH_LLM_MAX_QUEUED", "64"))
+
+# How long Ollama keeps the model loaded after a request
+LLM_KEEP_ALIVE = os.getenv("MINDSEARCH_LLM_KEEP_ALIVE", "30m")
+
+# Follow-up turns reuse the context tokens Ollama returned for the session
+# as long as the state, a new prompt with LLM_SESSION_CONTEXT_TOKENS of
+# retrieved context and the answer room fit in LLM_SESSION_MAX_TOKENS;
+# otherwise up to LLM_HISTORY_TOKENS of recent turns are sent as text and
+# the session starts over from that. Every turn of a session gets at most
+# LLM_SESSION_CONTEXT_TOKENS of context (less than a one-off question) so
+# that several turns fit in one state
+LLM_SESSION_MAX_TOKENS = int(os.getenv("MINDSEARCH_LLM_SESSION_MAX_TOKENS", str(LLM_NUM_CTX)))
+LLM_SESSION_CONTEXT_TOKENS = int(os.getenv("MINDSEARCH_LLM_SESSION_CONTEXT_TOKENS", "512"))
+LLM_HISTORY_TOKENS = int(os.getenv("MINDSEARCH_LLM_HISTORY_TOKENS", "1024"))
+LLM_SESSIONS = int(os.getenv("MINDSEARCH_LLM_SESSIONS", "1000"))
+
+# Hugging Face tokenizer matching the LLM, for exact prompt token counts.
+# Without one, prompts are measured in whitespace words times
+# LLM_TOKENS_PER_WORD; LLM tokenizers split English into ~1.3 tokens a word
+LLM_TOKENIZER = os.getenv("MINDSEARCH_LLM_TOKENIZER") or None
+LLM_TOKENS_PER_WORD = float(os.getenv("MINDSEARCH_LLM_TOKENS_PER_WORD", "1.3"))
+
+# Streamed tokens are coalesced into one SSE frame per SSE_FLUSH_MS
+# milliseconds or SSE_FLUSH_BYTES bytes, whichever is reached first
+SSE_FLUSH_MS = float(os.getenv("MINDSEARCH_SSE_FLUSH_MS", "25"))
+SSE_FLUSH_BYTES = int(os.getenv("MINDSEARCH_SSE_FLUSH_BYTES", "1024"))
+
+# ----- Storage -----
+# Root directory holding one sub-directory per namespace
+DATA_DIR = os.getenv("MINDSEARCH_DATA_DIR", "./data")
+
+# Uploaded documents, stored under their SHA-256 so identical files are
+# kept (and ingested into a namespace) only once
+UPLOAD_DIR = os.getenv("MINDSEARCH_UPLOAD_DIR", "./uploads")
+
+# Namespaces are keyed by chat session ("session") or by user ("user")
+NAMESPACE_SCOPE = os.getenv("MINDSEARCH_NAMESPACE_SCOPE", "session")
+
+# Memory budget for resident namespaces; colder ones are unloaded beyond it
+NAMESPACE_MEMORY_MB = int(os.getenv("MINDSEARCH_NAMESPACE_MEMORY_MB", "1024"))
+
+EMBEDDING_CACHE_PATH = os.getenv(
+    "MINDSEARCH_EMBEDDING_CACHE_PATH", os.path.join(DATA_DIR, "embedding_cache.sqlite3")
+)
+
+# Quantized ONNX models built by the "onnx" embedding backend
+EMBEDDING_ONNX_DIR = os.getenv("MINDSEARCH_EMBEDDING_ONNX_DIR", os.path.join(DATA_DIR, "onnx"))
+
+# ----- Index -----
+# Memory-map the FAISS index instead of reading it into RAM
+INDEX_MMAP = env_flag("MINDSEARCH_INDEX_MMAP")
+
+# "flat", "hnsw", "ivf", "ivfpq", or "auto" to pick by corpus size: flat
+# below INDEX_HNSW_MIN_VECTORS, HNSW below INDEX_IVF_MIN_VECTORS, IVF-PQ above
+INDEX_TYPE = os.getenv("MINDSEARCH_INDEX_TYPE", "auto")
+INDEX_HNSW_MIN_VECTORS = int(os.getenv("MINDSEARCH_INDEX_HNSW_MIN_VECTORS", "50000"))
+INDEX_IVF_MIN_VECTORS = int(os.getenv("MINDSEARCH_INDEX_IVF_MIN_VECTORS", "2000000"))
+
+# Vector storage inside the index: "float32", "float16", "int8" (scalar
+# quantization) or "binary" (sign bits, shortlist rescored with float vectors)
+INDEX_STORAGE = os.getenv("MINDSEARCH_INDEX_STORAGE", "float32")
+
+# The FAISS file is a checkpoint; vectors added since are replayed from the
+# vector store on load. It is rewritten once this many vectors were added
+INDEX_CHECKPOINT_VECTORS = int(os.getenv("MINDSEARCH_INDEX_CHECKPOINT_VECTORS", "10000"))
+
+# Binary indexes fetch k * BINARY_RESCORE_FACTOR candidates for rescoring
+BINARY_RESCORE_FACTOR = int(os.getenv("MINDSEARCH_BINARY_RESCORE_FACTOR", "10"))
+
+# HNSW graph degree and build / search beam widths
+HNSW_M = int(os.getenv("MINDSEARCH_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("MINDSEARCH_HNSW_EF_CONSTRUCTION", "200"))
+HNSW_EF_SEARCH = int(os.getenv("MINDSEARCH_HNSW_EF_SEARCH", "64"))
+
+# IVF lists probed per query, training sample size, and how much the corpus
+# may grow past the size an IVF index was trained on before it is rebuilt
+IVF_NPROBE = int(os.getenv("MINDSEARCH_IVF_NPROBE", "16"))
+IVF_TRAIN_SAMPLE = int(os.getenv("MINDSEARCH_IVF_TRAIN_SAMPLE", "100000"))
+IVF_REBUILD_GROWTH = float(os.getenv("MINDSEARCH_IVF_REBUILD_GROWTH", "4"))
+
+# ----- Ingestion -----
+# Chunk budget in tokens and the number of tokens repeated between chunks
+CHUNK_SIZE = int(os.getenv("MINDSEARCH_CHUNK_SIZE", "400"))
+CHUNK_OVERLAP = int(os.getenv("MINDSEARCH_CHUNK_OVERLAP", "0"))
+
+# Hugging Face tokenizer used to count tokens (whitespace words when empty)
+CHUNK_TOKENIZER = os.getenv("MINDSEARCH_CHUNK_TOKENIZER") or None
+
+# Worker processes for CPU-bound extraction, chunking and embedding
+INGEST_PROCESSES = int(os.getenv("MINDSEARCH_INGEST_PROCESSES", str(min(4, os.cpu_count() or 1))))
+
+# Ingest jobs processed concurrently
+INGEST_CONCURRENCY = int(os.getenv("MINDSEARCH_INGEST_CONCURRENCY", "2"))
+
+# Finished jobs kept around for the status endpoint
+INGEST_JOB_HISTORY = int(os.getenv("MINDSEARCH_INGEST_JOB_HISTORY", "200"))
@@ -0,0 +1,61 @@
+import hashlib
+import json
+import threading
+from array import array
+from collections import OrderedDict
+
+
+def history_digest(messages):
+    """Fingerprint of a conversation given as (role, content) pairs"""
+    payload = json.dumps([[role, content] for role, content in messages])
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class ConversationCache:
+    """Ollama context tokens of recent chat sessions.
+
+    After each turn Ollama returns the token state of the whole
+    conversation. Sending it back with the next prompt lets the server
+    reuse its cached prefix instead of evaluating the conversation again.
+    The state is only reused when the history a client sends matches the
+    one it was produced from (a regenerated or edited reply starts over).
+    The least recently used sessions are dropped beyond ``max_sessions``.
+    """
+
+    def __init__(self, max_sessions=1000):
+        self.max_sessions = max_sessions
+        self.hits = 0
+        self.misses = 0
+        # session id -> (history digest, context tokens)
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id, history):
+        """Return the context tokens for a session's history, or ``None``"""
+        digest = history_digest(history)
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None or entry[0] != digest:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._sessions.move_to_end(session_id)
+            return entry[1].tolist()
+
+    def put(self, session_id, history, context):
+        entry = (history_digest(history), array("i", context))
+        with self._lock:
+            self._sessions[session_id] = entry
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "sessions": len(self._sessions),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -1,21 +1,91 @@
-from sentence_transformers import SentenceTransformer
-import faiss
 import numpy as np
 import os
 
-model = SentenceTransformer("all-MiniLM-L6-v2")
+from config import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_MODEL,
+    EMBEDDING_DIM,
+    EMBEDDING_CACHE,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_ONNX_BATCH_SIZE,
+    EMBEDDING_ONNX_DIR,
+    EMBEDDING_ONNX_QUANTIZE,
+    EMBEDDING_ONNX_THREADS,
+    INGEST_PROCESSES,
+)
+from embedding_cache import EmbeddingCache
+from metrics import Histogram
+from resources import LazyResource
 
-def build_embeddings(chunks, index_path):
-    embeddings = model.encode(chunks, convert_to_numpy=True)
+EMBED_SECONDS = Histogram(
+    "mindsearch_embed_seconds", "Time to encode the chunks of one document"
+)
+QUERY_ENCODE_SECONDS = Histogram(
+    "mindsearch_query_encode_seconds", "Time to encode one batch of queries"
+)
 
-    index = faiss.IndexFlatIP(embeddings.shape[1])
-    index.add(embeddings)
+def embedding_model_id():
+    """Identify the configured embedding backend and model without loading it"""
+    if EMBEDDING_BACKEND == "sentence-transformers":
+        return EMBEDDING_MODEL
+    if EMBEDDING_BACKEND == "onnx":
+        # int8 vectors differ slightly, so they are cached apart
+        return f"onnx-{'int8' if EMBEDDING_ONNX_QUANTIZE else 'fp32'}:{EMBEDDING_MODEL}"
+    if EMBEDDING_BACKEND == "hash":
+        return f"hash-{EMBEDDING_DIM}"
+    raise ValueError(f"Unknown embedding backend: {EMBEDDING_BACKEND}")
 
-    faiss.write_index(index, index_path)
-    return True
+def load_model():
+    """Construct the model of the configured embedding backend"""
+    if EMBEDDING_BACKEND == "sentence-transformers":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(EMBEDDING_MODEL)
+    if EMBEDDING_BACKEND == "onnx":
+        from onnx_embedder import OnnxEmbedder
+        threads = EMBEDDING_ONNX_THREADS or max(1, (os.cpu_count() or 1) // INGEST_PROCESSES)
+        return OnnxEmbedder(
+            EMBEDDING_MODEL,
+            EMBEDDING_ONNX_DIR,
+            quantize=EMBEDDING_ONNX_QUANTIZE,
+            threads=threads,
+            batch_size=EMBEDDING_ONNX_BATCH_SIZE,
+        )
+    from hashing_embedder import HashingEmbedder
+    return HashingEmbedder(EMBEDDING_DIM)
 
-def search_embeddings(query, index_path, k=5):
-    index = faiss.read_index(index_path)
-    q = model.encode([query], convert_to_numpy=True)
-    scores, idxs = index.search(q, k)
-    return idxs[0]
+model_id = embedding_model_id()
+
+# Loaded on the first encode (or the warm-up at startup), so importing this
+# module stays cheap in the API process and in every ingest worker
+model = LazyResource("embedding_model", load_model)
+
+# Keyed by model id, so switching backends never serves foreign vectors
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH, model_id) if EMBEDDING_CACHE else None
+
+def encode_chunks(chunks):
+    """Encode chunk texts into a float32 matrix (one row per chunk).
+
+    Chunks already in the embedding cache are not re-encoded.
+    """
+    with EMBED_SECONDS.time():
+        return _encode_chunks(chunks)
+
+def _encode_chunks(chunks):
+    if embedding_cache is None:
+        return model.get().encode(chunks, convert_to_numpy=True)
+
+    cached = embedding_cache.lookup(chunks)
+    missing = [i for i, vec in enumerate(cached) if vec is None]
+
+    if missing:
+        fresh = model.get().encode([chunks[i] for i in missing], convert_to_numpy=True)
+        embedding_cache.store([chunks[i] for i in missing], fresh)
+        for i, vec in zip(missing, fresh):
+            cached[i] = vec
+
+    return np.vstack(cached).astype(np.float32)
+
+def encode_queries(queries):
+    """Encode a batch of queries in a single forward pass"""
+    with QUERY_ENCODE_SECONDS.time():
+        return model.get().encode(queries, convert_to_numpy=True)
@@ -0,0 +1,113 @@
+import hashlib
+import os
+import sqlite3
+import threading
+
+import numpy as np
+
+# SQLite caps the number of bound parameters per statement
+_BATCH = 500
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """Persistent content-addressed cache of chunk embeddings.
+
+    Vectors are stored in SQLite keyed by ``(model name, sha256(text))`` so
+    identical chunks are only ever encoded once per model, across uploads,
+    namespaces and restarts. Hit/miss counters live in the same database so
+    they add up across ingest worker processes.
+    """
+
+    def __init__(self, path, model_name):
+        self.path = path
+        self.model_name = model_name
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # Opened lazily so every worker process gets its own connection
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, hash BLOB NOT NULL, vector BLOB NOT NULL,"
+                " PRIMARY KEY (model, hash)) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS stats ("
+                " name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def lookup(self, texts):
+        """Return a list aligned with texts holding cached vectors or None"""
+        hashes = [text_hash(t) for t in texts]
+        found = {}
+
+        with self._lock:
+            conn = self._connect()
+            unique = list(set(hashes))
+            for start in range(0, len(unique), _BATCH):
+                batch = unique[start:start + _BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT hash, vector FROM embeddings"
+                    f" WHERE model = ? AND hash IN ({placeholders})",
+                    [self.model_name, *batch],
+                )
+                for h, blob in rows:
+                    found[h] = np.frombuffer(blob, dtype=np.float32)
+
+            hits = sum(1 for h in hashes if h in found)
+            self._bump(conn, hits, len(hashes) - hits)
+            conn.commit()
+
+        return [found.get(h) for h in hashes]
+
+    def store(self, texts, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        rows = [
+            (self.model_name, text_hash(t), v.tobytes())
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                rows,
+            )
+            conn.commit()
+
+    def _bump(self, conn, hits, misses):
+        conn.executemany(
+            "INSERT INTO stats (name, value) VALUES (?, ?)"
+            " ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            [("hits", hits), ("misses", misses)],
+        )
+
+    def stats(self):
+        with self._lock:
+            conn = self._connect()
+            counters = dict(conn.execute("SELECT name, value FROM stats"))
+            entries = conn.execute(
+                "SELECT COUNT(*) FROM embeddings WHERE model = ?", (self.model_name,)
+            ).fetchone()[0]
+
+        hits = counters.get("hits", 0)
+        misses = counters.get("misses", 0)
+        return {
+            "model": self.model_name,
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+        }
@@ -0,0 +1,42 @@
+import re
+import zlib
+
+import numpy as np
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbedder:
+    """Bag-of-words feature hashing with the ``SentenceTransformer.encode`` API.
+
+    Each word is hashed (CRC32, stable across processes) to a signed
+    dimension and the counts are L2-normalized. It needs no model download
+    and no GPU, and texts sharing words still end up close together, which
+    makes it a stand-in for benchmarks and offline development. It is not
+    a semantic model.
+    """
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, sentences, convert_to_numpy=True, **kwargs):
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        vectors = np.zeros((len(sentences), self.dim), dtype=np.float32)
+
+        for row, text in enumerate(sentences):
+            hashes = np.array(
+                [zlib.crc32(word.encode("utf-8")) for word in _WORD.findall(text.lower())],
+                dtype=np.uint64,
+            )
+            if not len(hashes):
+                continue
+            signs = np.where(hashes & (1 << 31), -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], (hashes % self.dim).astype(np.intp), signs)
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
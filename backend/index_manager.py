@@ -0,0 +1,475 @@
+import json
+import math
+import os
+import threading
+import uuid
+
+import faiss
+import numpy as np
+
+from config import (
+    BINARY_RESCORE_FACTOR,
+    INDEX_HNSW_MIN_VECTORS,
+    INDEX_IVF_MIN_VECTORS,
+    HNSW_M,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    INDEX_CHECKPOINT_VECTORS,
+    IVF_NPROBE,
+    IVF_REBUILD_GROWTH,
+    IVF_TRAIN_SAMPLE,
+)
+from locks import file_lock
+from metrics import Histogram
+from vector_store import VectorStore
+
+INDEX_TYPES = ("auto", "flat", "hnsw", "ivf", "ivfpq")
+STORAGE_TYPES = ("float32", "float16", "int8", "binary")
+
+INDEX_WRITE_SECONDS = Histogram(
+    "mindsearch_index_write_seconds", "Time to add one batch of vectors to an index"
+)
+SEARCH_SECONDS = Histogram(
+    "mindsearch_search_seconds", "Time of one (batched) FAISS search"
+)
+
+# IVF quantizers, PQ codebooks and int8 ranges need enough points to train
+# on; smaller corpora use flat / float16 storage until they grow past this
+MIN_TRAIN_VECTORS = 1024
+
+_SQ_TYPES = {
+    "float16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+
+def choose_index_type(count):
+    """Pick an index type for a corpus of ``count`` vectors"""
+    if count < INDEX_HNSW_MIN_VECTORS:
+        return "flat"
+    if count < INDEX_IVF_MIN_VECTORS:
+        return "hnsw"
+    return "ivfpq"
+
+
+def _pq_subquantizers(dim):
+    # PQ needs a sub-quantizer count that divides the dimension
+    for m in (64, 48, 32, 24, 16, 12, 8, 4, 2):
+        if dim % m == 0 and dim // m >= 2:
+            return m
+    return 1
+
+
+def create_index(kind, dim, count, storage="float32"):
+    """Create an empty, ID-mapped inner-product index.
+
+    ``storage`` selects how vectors are kept: full float32, float16 or
+    int8 scalar quantization, or 1-bit sign codes searched by Hamming
+    distance (IVF-PQ always uses its own PQ codes). IVF variants size their
+    coarse quantizer from ``count``, the number of vectors the index is
+    built for, and still need training.
+    """
+    nlist = max(1, min(int(4 * math.sqrt(count)), count // 39 or 1))
+
+    if storage == "binary":
+        # Codes are dim bits long; scores are rescored with the float vectors
+        if kind == "flat":
+            inner = faiss.IndexBinaryFlat(dim)
+        elif kind == "hnsw":
+            inner = faiss.IndexBinaryHNSW(dim, HNSW_M)
+            inner.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        else:
+            inner = faiss.IndexBinaryIVF(faiss.IndexBinaryFlat(dim), dim, nlist)
+        return faiss.IndexBinaryIDMap(inner)
+
+    metric = faiss.METRIC_INNER_PRODUCT
+    sq_type = _SQ_TYPES.get(storage)
+
+    if kind == "flat":
+        if sq_type is None:
+            inner = faiss.IndexFlatIP(dim)
+        else:
+            inner = faiss.IndexScalarQuantizer(dim, sq_type, metric)
+    elif kind == "hnsw":
+        if sq_type is None:
+            inner = faiss.IndexHNSWFlat(dim, HNSW_M, metric)
+        else:
+            inner = faiss.IndexHNSWSQ(dim, sq_type, HNSW_M, metric)
+        inner.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    elif kind == "ivf":
+        quantizer = faiss.IndexFlatIP(dim)
+        if sq_type is None:
+            inner = faiss.IndexIVFFlat(quantizer, dim, nlist, metric)
+        else:
+            inner = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, sq_type, metric)
+    elif kind == "ivfpq":
+        quantizer = faiss.IndexFlatIP(dim)
+        m = _pq_subquantizers(dim)
+        inner = faiss.IndexIVFPQ(quantizer, dim, nlist, m, 8, metric)
+    else:
+        raise ValueError(f"Unknown index type: {kind}")
+
+    return faiss.IndexIDMap(inner)
+
+
+def _inner(index):
+    if isinstance(index, faiss.IndexBinary):
+        return faiss.downcast_IndexBinary(index.index)
+    return faiss.downcast_index(index.index) if hasattr(index, "index") else index
+
+
+def _inner_storage(index, inner):
+    if isinstance(index, faiss.IndexBinary):
+        return faiss.downcast_IndexBinary(inner.storage)
+    return faiss.downcast_index(inner.storage)
+
+
+def apply_search_params(index):
+    """Apply the configured nprobe / efSearch to a (wrapped) index"""
+    inner = _inner(index)
+    if hasattr(inner, "hnsw"):
+        inner.hnsw.efSearch = HNSW_EF_SEARCH
+    elif hasattr(inner, "nprobe"):
+        inner.nprobe = IVF_NPROBE
+
+
+def to_binary_codes(vectors):
+    """Sign-quantize vectors into packed bit codes for binary indexes"""
+    return np.packbits(vectors > 0, axis=1)
+
+
+def _add_rows(index, vectors, ids, start=0):
+    """Add stored vectors from row ``start`` on, returns how many were added.
+
+    Rows are added in slices so memory-mapped vectors are never copied at once.
+    """
+    binary = isinstance(index, faiss.IndexBinary)
+    for begin in range(start, len(ids), 65536):
+        rows = np.ascontiguousarray(vectors[begin:begin + 65536])
+        index.add_with_ids(
+            to_binary_codes(rows) if binary else rows,
+            np.ascontiguousarray(ids[begin:begin + 65536]),
+        )
+    return max(0, len(ids) - start)
+
+
+def _merge(first, second, k, ascending):
+    """Merge two ``(scores, ids)`` search results into the best ``k`` per row"""
+    scores = np.hstack([first[0], second[0]])
+    ids = np.hstack([first[1], second[1]])
+    order = np.argsort(scores if ascending else -scores, axis=1, kind="stable")[:, :k]
+    return np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+
+
+def _resident_bytes(index):
+    """Approximate in-memory size of an index in bytes"""
+    if index is None:
+        return 0
+    inner = _inner(index)
+    if hasattr(inner, "hnsw"):
+        # Stored codes plus roughly 2 * M neighbour links on level 0
+        code_size = _inner_storage(index, inner).code_size + 8 * HNSW_M
+    else:
+        code_size = getattr(inner, "code_size", 4 * index.d)
+    # Vector codes plus the 64-bit ID kept by the ID map
+    return index.ntotal * (code_size + 8)
+
+
+def normalized(vectors):
+    """Return an L2-normalized float32 copy, so inner product is cosine"""
+    vectors = np.array(vectors, dtype=np.float32, copy=True, ndmin=2)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+class IndexManager:
+    """Keeps a FAISS index resident in memory between requests.
+
+    The index is read from disk once and reused. The :class:`VectorStore`
+    is the append-only log of every vector: adding a document only appends
+    to it and adds the new vectors to the resident index. The FAISS file is
+    a checkpoint, written when the index is rebuilt and after
+    ``INDEX_CHECKPOINT_VECTORS`` further vectors; on load, the vectors
+    appended since are replayed from the store. Each access costs a
+    ``stat`` of the index file and of the store, so vectors added by other
+    worker processes are picked up too. A memory-mapped index is
+    read-only, its replayed vectors live in a small in-memory flat index
+    searched alongside it. ``version`` is bumped whenever the index
+    contents change.
+
+    The index type is fixed by ``index_type`` or, with ``"auto"``, follows
+    the corpus size: exact flat search for small corpora, then HNSW, then
+    IVF-PQ. ``storage`` picks how vectors are held in the index (float32,
+    float16, int8 or binary codes). When the corpus crosses a threshold, or
+    outgrows the sample a trained index was fitted to, the index is rebuilt
+    from the raw vectors in the :class:`VectorStore` while searches keep
+    using the old index. Binary indexes rescore their Hamming shortlist
+    with the same raw vectors.
+    """
+
+    def __init__(self, index_path, mmap=False, index_type="auto", storage="float32"):
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type: {index_type}")
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"Unknown index storage: {storage}")
+        self.index_path = index_path
+        self.meta_path = f"{index_path}.json"
+        self.mmap = mmap
+        self.index_type = index_type
+        self.storage = storage
+        self.vectors = VectorStore(os.path.splitext(index_path)[0] + ".vectors")
+        self.version = 0
+        self.meta = {}
+        self._index = None
+        # Vectors added after the checkpoint, when the index is memory-mapped
+        self._delta = None
+        self._mtime = None
+        # Vector store rows in the resident index (and delta) / in its file
+        self._applied = 0
+        self._checkpointed = 0
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.index_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read(self, mmap, meta=None):
+        meta = self.meta if meta is None else meta
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+        if meta.get("storage") == "binary":
+            index = faiss.read_index_binary(self.index_path, flags)
+        else:
+            index = faiss.read_index(self.index_path, flags)
+        apply_search_params(index)
+        return index
+
+    def _load(self, mtime):
+        self.meta = self._read_meta()
+        self._index = self._read(self.mmap) if mtime is not None else None
+        self._delta = None
+        self._mtime = mtime
+        self._applied = self._checkpointed = (
+            self._index.ntotal if self._index is not None else 0
+        )
+        self._replay()
+        self.version += 1
+
+    def _replay(self):
+        """Add the vectors appended to the store since they were last applied.
+
+        The index holds the store's rows in order, so the number applied
+        tells where to continue. Returns whether anything was added.
+        """
+        index = self._index
+        if index is None or len(self.vectors) <= self._applied:
+            return False
+        vectors, ids = self.vectors.load(index.d)
+        target = index
+        if self.mmap:
+            if self._delta is None:
+                storage = "binary" if isinstance(index, faiss.IndexBinary) else "float32"
+                self._delta = create_index("flat", index.d, 0, storage)
+            target = self._delta
+        added = _add_rows(target, vectors, ids, self._applied)
+        self._applied += added
+        return added > 0
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def get(self):
+        """Return the resident index (``None`` if nothing was indexed yet)"""
+        mtime = self._file_mtime()
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    self._load(mtime)
+        elif self._index is not None and len(self.vectors) > self._applied:
+            # Another process appended vectors
+            with self._lock:
+                if self._replay():
+                    self.version += 1
+        return self._index
+
+    def _write(self, index, meta):
+        # Write next to the live file and swap it in atomically, so readers
+        # (and memory-mapped views of the old file) never see a partial index
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp_path = f"{self.index_path}.{uuid.uuid4().hex}.tmp"
+        if isinstance(index, faiss.IndexBinary):
+            faiss.write_index_binary(index, tmp_path)
+        else:
+            faiss.write_index(index, tmp_path)
+        with open(tmp_path + ".json", "w", encoding="utf-8") as out:
+            json.dump(meta, out)
+        os.replace(tmp_path + ".json", self.meta_path)
+        os.replace(tmp_path, self.index_path)
+
+    def _target(self, count):
+        """Return the (index type, storage) the corpus should be indexed with"""
+        kind = choose_index_type(count) if self.index_type == "auto" else self.index_type
+        storage = self.storage
+        if count < MIN_TRAIN_VECTORS:
+            if kind in ("ivf", "ivfpq"):
+                kind = "flat"
+            if storage == "int8":
+                # Too few vectors to fit int8 ranges, half precision needs none
+                storage = "float16"
+        return kind, storage
+
+    def _needs_rebuild(self, index, count):
+        if index is None:
+            return True
+        current = (self.meta.get("type", "flat"), self.meta.get("storage", "float32"))
+        if current != self._target(count):
+            return True
+        trained_on = self.meta.get("trained_on")
+        return bool(trained_on) and count > IVF_REBUILD_GROWTH * trained_on
+
+    def _build(self, kind, storage, dim):
+        """Build a fresh index of the given type over every stored vector"""
+        vectors, ids = self.vectors.load(dim)
+        index = create_index(kind, dim, len(ids), storage)
+        meta = {"type": kind, "storage": storage, "dim": dim}
+
+        if not index.is_trained:
+            rng = np.random.default_rng(0)
+            sample = min(len(ids), IVF_TRAIN_SAMPLE)
+            rows = np.sort(rng.choice(len(ids), size=sample, replace=False))
+            rows = np.ascontiguousarray(vectors[rows])
+            index.train(to_binary_codes(rows) if storage == "binary" else rows)
+            meta["trained_on"] = len(ids)
+
+        _add_rows(index, vectors, ids)
+        apply_search_params(index)
+        return index, meta
+
+    def add(self, embeddings, ids):
+        """Append vectors under the given IDs and persist the index"""
+        with INDEX_WRITE_SECONDS.time():
+            self._add(embeddings, ids)
+
+    def _add(self, embeddings, ids):
+        embeddings = normalized(embeddings)
+        ids = np.asarray(ids, dtype=np.int64)
+
+        # Writers are serialised, across processes too; searches only wait
+        # for the final swap
+        with self._write_lock, file_lock(f"{self.index_path}.lock"):
+            index = self.get()
+            self.vectors.append(embeddings, ids)
+            count = len(self.vectors)
+
+            if self._needs_rebuild(index, count):
+                kind, storage = self._target(count)
+                index, meta = self._build(kind, storage, embeddings.shape[1])
+                self._write(index, meta)
+                with self._lock:
+                    self._index = self._read(mmap=True, meta=meta) if self.mmap else index
+                    self._commit(meta, index.ntotal)
+                return
+
+            # Only the new vectors go into the index; the file is a checkpoint
+            with self._lock:
+                self._replay()
+                self.version += 1
+            if self._applied - self._checkpointed >= INDEX_CHECKPOINT_VECTORS:
+                self._checkpoint()
+
+    def _checkpoint(self):
+        """Write the index with every applied vector to disk"""
+        if self.mmap:
+            # Memory-mapped indexes are read-only, merge into a private copy
+            applied = self._applied
+            index = self._read(mmap=False)
+            vectors, ids = self.vectors.load(index.d)
+            _add_rows(index, vectors[:applied], ids[:applied], index.ntotal)
+            self._write(index, self.meta)
+            with self._lock:
+                self._index = self._read(mmap=True)
+                self._commit(self.meta, index.ntotal)
+        else:
+            # Searches wait while the resident index is written
+            with self._lock:
+                self._write(self._index, self.meta)
+                self._commit(self.meta, self._index.ntotal)
+
+    def _commit(self, meta, checkpointed):
+        """Swap in a freshly written index holding ``checkpointed`` store rows"""
+        self.meta = meta
+        self._mtime = self._file_mtime()
+        self._delta = None
+        self._applied = self._checkpointed = checkpointed
+        # Vectors other processes appended meanwhile
+        self._replay()
+        self.version += 1
+
+    def search(self, queries, k):
+        """Search the resident index, returns ``(scores, ids)`` or ``None``"""
+        with SEARCH_SECONDS.time():
+            return self._search(queries, k)
+
+    def _search(self, queries, k):
+        queries = normalized(queries)
+        with self._lock:
+            # FAISS does not support searching while vectors are being added
+            index = self.get()
+            if index is None or self._applied == 0:
+                return None
+            binary = isinstance(index, faiss.IndexBinary)
+            probe = to_binary_codes(queries) if binary else queries
+            width = k * BINARY_RESCORE_FACTOR if binary else k
+            result = index.search(probe, width)
+            if self._delta is not None:
+                # Hamming distances rank ascending, inner products descending
+                result = _merge(result, self._delta.search(probe, width), width, binary)
+            if not binary:
+                return result
+
+        return self._rescore(queries, result[1], k)
+
+    def _rescore(self, queries, shortlist, k):
+        """Re-rank a binary shortlist by exact inner product on float vectors"""
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+
+        for row, candidates in enumerate(shortlist):
+            candidates = candidates[candidates != -1]
+            vectors = self.vectors.lookup(candidates, queries.shape[1])
+            exact = vectors @ queries[row]
+            top = np.argsort(-exact)[:k]
+            scores[row, :len(top)] = exact[top]
+            ids[row, :len(top)] = candidates[top]
+
+        return scores, ids
+
+    def lookup(self, ids):
+        """Return ``(ids, vectors)`` for those of the given IDs that are indexed.
+
+        Vectors are the normalized embeddings the index was built from.
+        """
+        self.get()
+        ids = np.asarray(ids, dtype=np.int64)
+        dim = self.meta.get("dim")
+        if dim is None:
+            return ids[:0], np.empty((0, 0), dtype=np.float32)
+        found, vectors = self.vectors.find(ids, dim)
+        return ids[found], vectors
+
+    def memory_usage(self):
+        """Approximate resident size of the index in bytes"""
+        # Memory-mapped pages belong to the OS page cache
+        usage = 0 if self.mmap else _resident_bytes(self._index)
+        return usage + _resident_bytes(self._delta)
+
+    @property
+    def ntotal(self):
+        self.get()
+        return self._applied
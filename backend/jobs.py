@@ -0,0 +1,158 @@
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from chunker import extract_pages_from_file, chunk_pages
+from config import CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_TOKENIZER
+from embedder import encode_chunks
+from metrics import submit_with_metrics
+
+
+class IngestJob:
+    """Progress of one ``/v1/ingest`` request"""
+
+    def __init__(self, namespace, files):
+        self.id = uuid.uuid4().hex
+        self.namespace = namespace
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # One entry per upload: name, stored path, sha256 and file type
+        self.files = [
+            {
+                **upload,
+                "stage": "queued",
+                "pages": 0,
+                "chunks": 0,
+                "duplicate": False,
+                "seconds": None,
+                "error": None,
+            }
+            for upload in files
+        ]
+
+    def to_dict(self):
+        end = self.finished_at or time.time()
+        elapsed = end - self.started_at if self.started_at else 0.0
+        done = [f for f in self.files if f["stage"] == "done"]
+        failed = [f for f in self.files if f["stage"] == "failed"]
+        chunks = sum(f["chunks"] for f in self.files)
+
+        return {
+            "job_id": self.id,
+            "namespace": self.namespace,
+            "status": self.status,
+            "created_at": self.created_at,
+            "elapsed": elapsed,
+            "files": [
+                {k: v for k, v in f.items() if k != "path"} for f in self.files
+            ],
+            "files_done": len(done),
+            "files_failed": len(failed),
+            "files_duplicate": sum(f["duplicate"] for f in self.files),
+            "files_total": len(self.files),
+            "chunks_total": chunks,
+            "throughput": {
+                "files_per_s": len(done) / elapsed if elapsed else 0.0,
+                "chunks_per_s": chunks / elapsed if elapsed else 0.0,
+            },
+        }
+
+
+class IngestJobQueue:
+    """Runs document ingestion in the background.
+
+    Each job runs on a runner thread that only coordinates: extraction,
+    chunking and embedding are submitted to a process pool so they neither
+    block the event loop nor contend for the GIL. PDFs are split into page
+    ranges extracted in parallel. Encoded chunks are then appended to the
+    namespace from the runner thread.
+    """
+
+    def __init__(self, pipeline, processes, concurrency, history):
+        self.pipeline = pipeline
+        self.history = history
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._runners = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="ingest"
+        )
+        # spawn: forking a process that already holds torch/FAISS threads is unsafe
+        self._processes = ProcessPoolExecutor(
+            max_workers=processes, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    def submit(self, namespace, files):
+        job = IngestJob(namespace, files)
+        with self._lock:
+            self._jobs[job.id] = job
+            # Forget the oldest finished jobs beyond the history limit
+            while len(self._jobs) > self.history:
+                oldest = next(iter(self._jobs.values()))
+                if oldest.finished_at is None:
+                    break
+                del self._jobs[oldest.id]
+
+        self._runners.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job):
+        job.status = "running"
+        job.started_at = time.time()
+
+        for entry in job.files:
+            start = time.perf_counter()
+            try:
+                self._ingest_file(job, entry)
+                entry["stage"] = "done"
+            except Exception as e:
+                print(f"Error ingesting {entry['path']}: {str(e)}")
+                entry["stage"] = "failed"
+                entry["error"] = str(e)
+            entry["seconds"] = time.perf_counter() - start
+
+        failed = all(f["stage"] == "failed" for f in job.files)
+        job.status = "failed" if failed else "done"
+        job.finished_at = time.time()
+
+    def _ingest_file(self, job, entry):
+        # Known content is skipped, whatever the file was called
+        if self.pipeline.is_indexed(entry["sha256"], job.namespace):
+            entry["duplicate"] = True
+            return
+
+        entry["stage"] = "extracting"
+        pages = extract_pages_from_file(
+            entry["path"], executor=self._processes, file_type=entry["type"]
+        )
+        entry["pages"] = len(pages)
+        if not pages:
+            return
+
+        entry["stage"] = "chunking"
+        chunks = submit_with_metrics(
+            self._processes, chunk_pages, pages, CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_TOKENIZER
+        )
+        entry["chunks"] = len(chunks)
+        if not chunks:
+            return
+
+        entry["stage"] = "embedding"
+        texts = [c["text"] for c in chunks]
+        embeddings = submit_with_metrics(self._processes, encode_chunks, texts)
+
+        entry["stage"] = "indexing"
+        if not self.pipeline.index_chunks(chunks, embeddings, entry["sha256"], job.namespace):
+            entry["duplicate"] = True
+
+    def shutdown(self):
+        self._runners.shutdown(wait=False, cancel_futures=True)
+        self._processes.shutdown(wait=False, cancel_futures=True)
@@ -1,43 +1,320 @@
 import asyncio
-import ollama
-import queue
-import threading
-
-async def stream_generate(model, query, context):
-    prompt = f"Context:\n{context}\n\nQuestion:\n{query}\n\nAnswer:"
-    
-    try:
-        # Use a thread-safe queue for communication between threads
-        token_queue = queue.Queue()
-        
-        def generate_sync():
+import json
+import time
+
+import aiohttp
+
+from config import (
+    LLM_BACKENDS,
+    LLM_BREAKER_COOLDOWN,
+    LLM_BREAKER_FAILURES,
+    LLM_HEALTH_INTERVAL,
+    LLM_KEEP_ALIVE,
+    LLM_NUM_CTX,
+    OLLAMA_HOST,
+    OLLAMA_MAX_CONNECTIONS,
+    OLLAMA_READ_TIMEOUT,
+)
+from metrics import Gauge, Histogram
+from streaming import aclosing
+
+# Weight of the newest sample in a backend's moving average latency
+LATENCY_ALPHA = 0.2
+
+TTFT_SECONDS = Histogram(
+    "mindsearch_llm_ttft_seconds",
+    "Time from sending a prompt to Ollama to its first answer token",
+)
+TOKENS_PER_SECOND = Histogram(
+    "mindsearch_llm_tokens_per_second",
+    "Decode speed of one generation as reported by Ollama",
+    buckets=(1, 2, 5, 10, 15, 20, 30, 40, 50, 75, 100, 150, 200, 300),
+)
+
+
+class OllamaError(Exception):
+    """Raised when the Ollama API returns an error"""
+
+
+class OllamaClient:
+    """Minimal asyncio client for Ollama's streaming ``/api/generate``.
+
+    All requests share one ``aiohttp`` session whose connection pool keeps
+    connections to the server alive, and responses are parsed as they
+    arrive on the event loop, so a stream never needs a thread of its own.
+    """
+
+    def __init__(self, host=OLLAMA_HOST, max_connections=OLLAMA_MAX_CONNECTIONS,
+                 read_timeout=OLLAMA_READ_TIMEOUT):
+        if "://" not in host:
+            host = f"http://{host}"
+        self.host = host.rstrip("/")
+        self.max_connections = max_connections
+        self.read_timeout = read_timeout
+        self.aborted = 0
+        self._session = None
+
+    def _get_session(self):
+        # Created lazily: a ClientSession must be bound to the running loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections, keepalive_timeout=60
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=None, sock_connect=10, sock_read=self.read_timeout
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+
+    async def generate(self, model, prompt, **options):
+        """Yield the JSON chunks of a streaming generation"""
+        payload = {"model": model, "prompt": prompt, "stream": True, **options}
+        session = self._get_session()
+
+        async with session.post(f"{self.host}/api/generate", json=payload) as resp:
+            if resp.status != 200:
+                raise OllamaError(f"HTTP {resp.status}: {await resp.text()}")
+
             try:
-                response = ollama.generate(model=model, prompt=prompt, stream=True)
-                for chunk in response:
-                    token = chunk.get("response", "")
-                    if token:
-                        token_queue.put(("token", token))
-                token_queue.put(("done", None))
-            except Exception as e:
-                token_queue.put(("error", str(e)))
-                token_queue.put(("done", None))
-        
-        # Start the sync generation in a thread
-        thread = threading.Thread(target=generate_sync, daemon=True)
-        thread.start()
-        
-        # Yield tokens as they arrive
+                # NDJSON; the final chunk can be far longer than aiohttp's line limit
+                buffer = b""
+                async for data in resp.content.iter_any():
+                    buffer += data
+                    *lines, buffer = buffer.split(b"\n")
+                    for line in lines:
+                        if not line.strip():
+                            continue
+                        chunk = json.loads(line)
+                        if "error" in chunk:
+                            raise OllamaError(chunk["error"])
+                        yield chunk
+                        if chunk.get("done"):
+                            return
+            except BaseException:
+                # Cancelled or closed early: drop the connection so Ollama
+                # stops generating instead of finishing for nobody
+                self.aborted += 1
+                resp.close()
+                raise
+
+    async def healthy(self, timeout=5):
+        """Whether the server answers ``/api/version``"""
+        try:
+            async with self._get_session().get(
+                f"{self.host}/api/version", timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as resp:
+                return resp.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class Backend:
+    """A client in a pool, with its circuit breaker and latency statistics"""
+
+    def __init__(self, client, failure_threshold, cooldown):
+        self.client = client
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.failures = 0  # in a row
+        self.open_until = 0.0
+        self.latency = None  # moving average time to first chunk
+
+    def available(self, now):
+        return now >= self.open_until
+
+    def tripped(self):
+        return self.failures >= self.failure_threshold
+
+    def succeeded(self, latency):
+        self.failures = 0
+        self.open_until = 0.0
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_ALPHA * (latency - self.latency)
+
+    def failed(self, now):
+        self.errors += 1
+        self.failures += 1
+        if self.tripped():
+            self.open_until = now + self.cooldown
+
+    def stats(self, now):
+        if not self.tripped():
+            state = "closed"
+        elif self.available(now):
+            state = "half-open"
+        else:
+            state = "open"
+        return {
+            "host": self.client.host,
+            "state": state,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ttft_ms": None if self.latency is None else round(self.latency * 1000, 1),
+        }
+
+
+class BackendPool:
+    """Spreads generations over several LLM clients.
+
+    Any client with ``generate(model, prompt, **options)``, ``healthy()``
+    and ``close()`` can be pooled. Each request goes to the available
+    backend with the fewest requests in flight (ties go to the lower
+    latency). A backend failing ``failure_threshold`` times in a row, in
+    requests or background health checks, is skipped for ``cooldown``
+    seconds; after that one trial request decides whether it rejoins.
+    Requests failing before their first chunk are retried on another
+    backend.
+    """
+
+    def __init__(self, clients, failure_threshold=LLM_BREAKER_FAILURES,
+                 cooldown=LLM_BREAKER_COOLDOWN, health_interval=LLM_HEALTH_INTERVAL):
+        self.backends = [Backend(c, failure_threshold, cooldown) for c in clients]
+        self.health_interval = health_interval
+        self._health_task = None
+
+    def pick(self, exclude=()):
+        """The backend for the next request, or None when none is available"""
+        now = time.monotonic()
+        candidates = [
+            b for b in self.backends if b not in exclude and b.available(now)
+        ]
+        if not candidates:
+            return None
+        backend = min(
+            candidates,
+            key=lambda b: (b.outstanding, float("inf") if b.latency is None else b.latency),
+        )
+        if backend.tripped():
+            # Half-open: hold the other requests back until this trial ends
+            backend.open_until = now + backend.cooldown
+        return backend
+
+    async def generate(self, model, prompt, **options):
+        """Yield the JSON chunks of a streaming generation"""
+        tried = []
+        error = OllamaError("No LLM backend is available")
         while True:
-            msg_type, value = token_queue.get()
-            if msg_type == "done":
-                break
-            elif msg_type == "error":
-                yield f"Error: {value}"
-                break
+            backend = self.pick(tried)
+            if backend is None:
+                raise error
+            tried.append(backend)
+            backend.outstanding += 1
+            backend.requests += 1
+            start = time.perf_counter()
+            started = False
+            generation = backend.client.generate(model, prompt, **options)
+            try:
+                async with aclosing(generation):
+                    async for chunk in generation:
+                        if not started:
+                            started = True
+                            backend.succeeded(time.perf_counter() - start)
+                        yield chunk
+                return
+            except (OllamaError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                backend.failed(time.monotonic())
+                if started:
+                    raise
+                print(f"LLM backend {backend.client.host} failed: {e}")
+                error = e
+            finally:
+                backend.outstanding -= 1
+
+    def available(self):
+        now = time.monotonic()
+        return sum(b.available(now) for b in self.backends)
+
+    async def check(self):
+        """Probe every backend once"""
+        async def probe(backend):
+            if await backend.client.healthy():
+                # Let a recovered backend take a trial request right away
+                if backend.tripped():
+                    backend.open_until = min(backend.open_until, time.monotonic())
             else:
-                yield value
-        
-        thread.join(timeout=5)
-        
-    except Exception as e:
-        yield f"Error generating response: {str(e)}"
+                backend.failed(time.monotonic())
+
+        await asyncio.gather(*(probe(b) for b in self.backends))
+
+    async def _health_loop(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.health_interval)
+
+    def start(self):
+        """Start the background health checks (needs a running event loop)"""
+        if self._health_task is None and self.health_interval > 0:
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    def stats(self):
+        now = time.monotonic()
+        return {"backends": [b.stats(now) for b in self.backends]}
+
+    async def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        for backend in self.backends:
+            await backend.client.close()
+
+
+client = BackendPool([OllamaClient(host) for host in LLM_BACKENDS])
+
+Gauge(
+    "mindsearch_llm_backends_available", "LLM backends not cut off by their circuit breaker",
+    fn=client.available,
+)
+
+
+def build_prompt(query, context, transcript=""):
+    # Earlier turns come first so consecutive prompts share a prefix
+    return f"{transcript}Context:\n{context}\n\nQuestion:\n{query}\n\nAnswer:"
+
+
+def build_transcript(turns):
+    """Earlier (role, content) turns as plain text"""
+    return "".join(f"{role.capitalize()}: {content}\n\n" for role, content in turns)
+
+
+async def stream_generate(model, query, context, transcript="", conversation=None,
+                          on_done=None):
+    """Yield answer tokens; errors are raised to the caller.
+
+    ``conversation`` is the context token state Ollama returned for the
+    previous turn; the prompt then only holds the new turn. ``on_done`` is
+    called with the final chunk, which carries the updated state.
+    """
+    prompt = build_prompt(query, context, transcript)
+    options = {"num_ctx": LLM_NUM_CTX}
+    extra = {"context": conversation} if conversation else {}
+    start = time.perf_counter()
+    first = None
+
+    generation = client.generate(
+        model, prompt, keep_alive=LLM_KEEP_ALIVE, options=options, **extra
+    )
+    async with aclosing(generation):
+        async for chunk in generation:
+            token = chunk.get("response", "")
+            if token:
+                if first is None:
+                    first = time.perf_counter()
+                    TTFT_SECONDS.observe(first - start)
+                yield token
+            if chunk.get("done"):
+                # Ollama reports its own decode timing (nanoseconds)
+                if chunk.get("eval_count") and chunk.get("eval_duration"):
+                    TOKENS_PER_SECOND.observe(chunk["eval_count"] / (chunk["eval_duration"] / 1e9))
+                if on_done is not None:
+                    on_done(chunk)
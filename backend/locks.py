@@ -0,0 +1,26 @@
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no advisory locks, run a single writing process there
+    fcntl = None
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive advisory lock on ``path`` across processes.
+
+    Wraps read-modify-write sequences on files shared by several worker
+    processes. The lock file is created if needed and never removed.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
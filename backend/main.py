@@ -1,20 +1,103 @@
-from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import List, Optional
-import json
+from contextlib import asynccontextmanager
 import asyncio
-import os
-
+import time
+
+import metrics
+import resources
+from config import (
+    NAMESPACE_SCOPE,
+    INGEST_PROCESSES,
+    INGEST_CONCURRENCY,
+    INGEST_JOB_HISTORY,
+    SSE_FLUSH_MS,
+    SSE_FLUSH_BYTES,
+    LLM_CONCURRENCY,
+    LLM_MAX_QUEUED,
+    UPLOAD_DIR,
+    WARM_UP,
+)
+from embedder import embedding_cache
+from jobs import IngestJobQueue
+from llm import client as llm_client
 from rag_pipeline import RAGPipeline
-
-app = FastAPI()
+from scheduler import FairScheduler, QueueFull
+from streaming import (
+    DONE_FRAME,
+    ClosingStreamingResponse,
+    aclosing,
+    coalesce,
+    error_frame,
+    queue_frame,
+    sse_frame,
+    until_disconnected,
+)
+from uploads import UploadStore, file_type
+
+@asynccontextmanager
+async def lifespan(app):
+    llm_client.start()
+    # Serve right away; requests arriving first load what they need
+    # themselves. The task is kept for /ready
+    app.state.warm_up = None
+    if WARM_UP:
+        app.state.warm_up = asyncio.create_task(asyncio.to_thread(resources.warm_up))
+    try:
+        yield
+    finally:
+        # Don't leave it pending; the loading thread finishes on its own
+        if app.state.warm_up is not None:
+            app.state.warm_up.cancel()
+        ingest_jobs.shutdown()
+        rag.queries.shutdown()
+        await llm_client.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # Simple base-paper RAG pipeline (no BM25, no KG, no encryption)
 rag = RAGPipeline()
 
-# Ensure uploads directory exists
-os.makedirs("uploads", exist_ok=True)
+# Ingestion runs in the background so uploads never block chat streams
+ingest_jobs = IngestJobQueue(
+    rag,
+    processes=INGEST_PROCESSES,
+    concurrency=INGEST_CONCURRENCY,
+    history=INGEST_JOB_HISTORY,
+)
+
+# Limits concurrent generations; waiting requests are served fairly per user
+llm_scheduler = FairScheduler(LLM_CONCURRENCY, LLM_MAX_QUEUED)
+
+REQUEST_SECONDS = metrics.Histogram(
+    "mindsearch_request_seconds", "Total time of a chat request, including queueing"
+)
+IN_FLIGHT = metrics.Gauge(
+    "mindsearch_streams_in_flight", "Chat streams currently open"
+)
+metrics.Gauge(
+    "mindsearch_index_vectors", "Vectors indexed in the loaded namespaces",
+    fn=lambda: rag.namespaces.totals()[0],
+)
+metrics.Gauge(
+    "mindsearch_chunks", "Chunks stored in the loaded namespaces",
+    fn=lambda: rag.namespaces.totals()[1],
+)
+metrics.Gauge(
+    "mindsearch_llm_queue_waiting", "Chat requests waiting for a generation slot",
+    fn=lambda: llm_scheduler.waiting,
+)
+
+# Uploaded files, stored by content hash
+uploads = UploadStore(UPLOAD_DIR)
+
+def resolve_namespace(session_id, user_id):
+    """Pick the index namespace for a request (per session or per user)"""
+    if NAMESPACE_SCOPE == "user" and user_id:
+        return user_id
+    return session_id
 
 class ChatMessage(BaseModel):
     role: str
@@ -27,47 +110,159 @@ class ChatRequest(BaseModel):
     session_id: Optional[str] = None
 
 @app.post("/v1/chat/completions")
-async def chat_endpoint(req: ChatRequest):
+async def chat_endpoint(
+    req: ChatRequest,
+    request: Request,
+    x_openwebui_user_id: Optional[str] = Header(None)
+):
 
     user_query = req.messages[-1].content
-
-    # 1. Retrieve context
-    context = rag.retrieve_context(user_query)
-
-    # 2. Stream LLM answer
+    history = [(m.role, m.content) for m in req.messages[:-1]]
+    namespace = resolve_namespace(req.session_id, x_openwebui_user_id)
+    start = time.perf_counter()
+
+    # Retrieval and answer cache hits don't queue behind generations
+    cached, retrieval, error = None, None, None
+    try:
+        cached, retrieval = await rag.prepare(user_query, namespace, history)
+    except Exception as e:
+        error = str(e)
+
+    ticket = None
+    if retrieval is not None:
+        # Reject right away rather than queueing without bound
+        try:
+            ticket = llm_scheduler.enqueue(x_openwebui_user_id or req.session_id)
+        except QueueFull:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests are waiting for the model, retry shortly",
+                headers={"Retry-After": "1"},
+            )
+
+    # Replay a cached answer, or wait for a generation slot (reporting the
+    # queue position) and stream the LLM answer, several tokens per SSE frame
     async def event_stream():
+        IN_FLIGHT.inc()
         try:
-            async for token in rag.stream_answer(user_query, context):
-                yield f"data: {json.dumps({'choices':[{'delta':{'content':token}}]})}\n\n"
-                await asyncio.sleep(0.01)
+            if error is not None:
+                yield error_frame(error)
+            elif ticket is None:
+                yield sse_frame(cached)
+            else:
+                async for position in ticket.wait():
+                    yield queue_frame(position)
+
+                tokens = rag.generate(
+                    user_query, retrieval, namespace, history, req.session_id
+                )
+                async with aclosing(coalesce(tokens, SSE_FLUSH_MS, SSE_FLUSH_BYTES)) as pieces:
+                    async for piece in pieces:
+                        yield sse_frame(piece)
         except Exception as e:
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
-        
-        yield "data: [DONE]\n\n"
-
-    return StreamingResponse(event_stream(), media_type="text/event-stream")
+            yield error_frame(str(e))
+        finally:
+            if ticket is not None:
+                ticket.release()
+            IN_FLIGHT.dec()
+            REQUEST_SECONDS.observe(time.perf_counter() - start)
+
+        yield DONE_FRAME
+
+    def release():
+        # Also when the response fails before event_stream() ever ran
+        if ticket is not None:
+            ticket.release()
+
+    # Stop generating as soon as the client goes away
+    return ClosingStreamingResponse(
+        until_disconnected(request, event_stream()),
+        on_close=release,
+        media_type="text/event-stream",
+    )
 
 @app.post("/v1/ingest")
 async def ingest_endpoint(
     session_id: str = Form(...),
-    files: List[UploadFile] = File(...)
+    files: List[UploadFile] = File(...),
+    x_openwebui_user_id: Optional[str] = Header(None)
 ):
-    processed = 0
+    namespace = resolve_namespace(session_id, x_openwebui_user_id)
+    to_ingest, stored = {}, []
 
     for f in files:
-        raw = await f.read()
-
-        # Save file
-        file_path = f"./uploads/{f.filename}"
-        with open(file_path, "wb") as out:
-            out.write(raw)
-
-        # Ingest into RAG
-        rag.ingest_document(file_path)
-
-        processed += 1
-
-    return {"status": "success", "processed": processed}
+        # Streamed to disk piece by piece off the event loop, whatever the size
+        digest, file_path = await asyncio.to_thread(uploads.save, f.file)
+        await f.close()
+        stored.append({"name": f.filename, "sha256": digest})
+
+        # The same content twice in one upload is ingested once
+        to_ingest.setdefault(digest, {
+            "name": f.filename,
+            "path": file_path,
+            "sha256": digest,
+            "type": file_type(f.filename),
+        })
+
+    # Ingest into RAG in the background, progress via /v1/ingest/{job_id};
+    # files already in the namespace are skipped there
+    job = ingest_jobs.submit(namespace, list(to_ingest.values()))
+
+    return {"status": "accepted", "job_id": job.id, "files": len(stored), "uploads": stored}
+
+@app.get("/v1/ingest/{job_id}")
+async def ingest_status(job_id: str):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown ingest job")
+    return job.to_dict()
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/v1/namespaces/stats")
+async def namespace_stats():
+    return rag.namespaces.stats()
+
+@app.get("/v1/embedding-cache/stats")
+async def embedding_cache_stats():
+    if embedding_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **embedding_cache.stats()}
+
+@app.get("/v1/answer-cache/stats")
+async def answer_cache_stats():
+    if rag.answers is None:
+        return {"enabled": False}
+    return {"enabled": True, **rag.answers.stats()}
+
+@app.get("/v1/conversations/stats")
+async def conversation_stats():
+    return rag.conversations.stats()
+
+@app.get("/v1/scheduler/stats")
+async def scheduler_stats():
+    return llm_scheduler.stats()
+
+@app.get("/v1/retrieval/stats")
+async def retrieval_stats():
+    cache = rag.retrievals.stats() if rag.retrievals is not None else {"enabled": False}
+    return {"batching": rag.queries.stats(), "cache": cache}
+
+@app.get("/v1/llm/stats")
+async def llm_stats():
+    return llm_client.stats()
+
+@app.get("/ready")
+async def ready(request: Request):
+    status = resources.status()
+    warm_up = getattr(request.app.state, "warm_up", None)
+    warming = warm_up is not None and not warm_up.done()
+    is_ready = not warming and not any(s["error"] for s in status.values())
+    return JSONResponse(
+        {"ready": is_ready, "resources": status}, status_code=200 if is_ready else 503
+    )
 
 
 
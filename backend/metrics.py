@@ -0,0 +1,147 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Seconds, from sub-millisecond searches to long generations
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0,
+)
+
+# name -> metric, in registration order
+REGISTRY = {}
+
+
+def _format(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Histogram:
+    """Prometheus-style histogram with fixed buckets.
+
+    An observation is one bisect and two additions under a lock, cheap
+    enough for the request path.
+    """
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        """Observe the duration of a ``with`` block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def drain(self):
+        """Return ``(counts, sum)`` observed so far and start over"""
+        with self._lock:
+            snapshot = (self.counts, self.sum)
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.sum = 0.0
+        return snapshot
+
+    def merge(self, counts, total):
+        with self._lock:
+            self.counts = [a + b for a, b in zip(self.counts, counts)]
+            self.sum += total
+
+    def render(self):
+        with self._lock:
+            counts, total = list(self.counts), self.sum
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} histogram",
+        ]
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{_format(bound)}"}} {cumulative}')
+        lines.append(f"{self.name}_sum {_format(total)}")
+        lines.append(f"{self.name}_count {cumulative}")
+        return lines
+
+
+class Gauge:
+    """A value that goes up and down, or is computed by ``fn`` when scraped"""
+
+    def __init__(self, name, documentation, fn=None):
+        self.name = name
+        self.documentation = documentation
+        self.fn = fn
+        self.value = 0.0
+        self._lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        self.value = value
+
+    def render(self):
+        value = self.fn() if self.fn is not None else self.value
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} gauge",
+            f"{self.name} {_format(value)}",
+        ]
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in list(REGISTRY.values()):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Ingest stages run in worker processes, whose metrics live in their own
+# copy of this module; these helpers carry them back to the server process
+
+def call_with_metrics(fn, *args, **kwargs):
+    """Run ``fn`` and return ``(result, observations)`` (worker side)"""
+    result = fn(*args, **kwargs)
+    observed = {}
+    for name, metric in REGISTRY.items():
+        if isinstance(metric, Histogram):
+            counts, total = metric.drain()
+            if any(counts):
+                observed[name] = (counts, total)
+    return result, observed
+
+
+def merge(observed):
+    """Add observations returned by :func:`call_with_metrics` (server side)"""
+    for name, (counts, total) in observed.items():
+        metric = REGISTRY.get(name)
+        if isinstance(metric, Histogram):
+            metric.merge(counts, total)
+
+
+def submit_with_metrics(executor, fn, *args, **kwargs):
+    """Run ``fn`` on a process pool and merge its metrics into this process"""
+    result, observed = executor.submit(call_with_metrics, fn, *args, **kwargs).result()
+    merge(observed)
+    return result
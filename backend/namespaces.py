@@ -0,0 +1,192 @@
+import asyncio
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import asynccontextmanager, contextmanager
+
+from chunk_store import ChunkStore
+from index_manager import IndexManager
+from locks import file_lock
+from retriever import BM25Index
+
+DEFAULT_NAMESPACE = "default"
+
+_SAFE_NAME = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def namespace_dirname(name):
+    """Map a namespace name to a safe directory name"""
+    if _SAFE_NAME.match(name):
+        return name
+    return hashlib.sha1(name.encode("utf-8")).hexdigest()
+
+
+class Namespace:
+    """Indexes and chunk store of a single tenant, kept in its own directory"""
+
+    def __init__(self, name, root, **index_options):
+        self.name = name
+        # The directory is only created once something is written to it
+        self.path = os.path.join(root, namespace_dirname(name))
+
+        self.index = IndexManager(os.path.join(self.path, "faiss.index"), **index_options)
+        self.store = ChunkStore(os.path.join(self.path, "chunks.jsonl"))
+        self.lexical = BM25Index(os.path.join(self.path, "bm25.npz"))
+        self.users = 0
+        self._write_lock = threading.Lock()
+
+    @property
+    def version(self):
+        """Changes whenever documents are added to the namespace.
+
+        Chunks are only ever appended, so the number of indexed vectors is
+        enough; unlike ``IndexManager.version`` it also survives the
+        namespace being evicted and reloaded.
+        """
+        return self.index.ntotal
+
+    @contextmanager
+    def writing(self):
+        """Serialise writers of this namespace, across threads and processes.
+
+        Keeps chunk IDs in the same order in every store and makes a
+        duplicate check and the appends that follow it atomic.
+        """
+        with self._write_lock, file_lock(os.path.join(self.path, "write.lock")):
+            yield
+
+    def memory_usage(self):
+        return self.index.memory_usage() + self.store.nbytes + self.lexical.memory_usage()
+
+
+class NamespaceCache:
+    """LRU cache of loaded namespaces bounded by a memory budget.
+
+    Everything a namespace holds is persisted as soon as it is written, so
+    evicting a cold namespace only drops it from memory; the next request
+    for it lazily reloads it from disk. Namespaces in use by a request are
+    never evicted. Memory use is tracked per namespace and only measured
+    again when a request releases it, the only time it can have grown.
+
+    Loading reads the chunk store, the BM25 index and the vector index
+    from disk without holding the cache lock; concurrent requests for the
+    same namespace wait for the one load in progress. Async code uses
+    ``use_async``, which loads in a worker thread.
+    """
+
+    def __init__(self, root, memory_budget, **index_options):
+        self.root = root
+        self.memory_budget = memory_budget
+        # Passed on to every namespace's IndexManager
+        self.index_options = index_options
+        self.evictions = 0
+        # Bytes held by all loaded namespaces, and by each of them
+        self.usage = 0
+        self._usage = {}
+        self._namespaces = OrderedDict()
+        # Futures of the namespaces being loaded, by name
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def use(self, name=None):
+        """Pin a namespace (loading it if needed) for the duration of a block"""
+        name = name or DEFAULT_NAMESPACE
+        namespace = self._acquire(name)
+        try:
+            yield namespace
+        finally:
+            self._release(name, namespace)
+
+    @asynccontextmanager
+    async def use_async(self, name=None):
+        """Like ``use``, but loads the namespace off the event loop"""
+        name = name or DEFAULT_NAMESPACE
+        namespace = self._pin(name)
+        if namespace is None:
+            namespace = await asyncio.to_thread(self._acquire, name)
+        try:
+            yield namespace
+        finally:
+            self._release(name, namespace)
+
+    def _pin(self, name):
+        """Pin a loaded namespace; ``None`` if it is not loaded"""
+        with self._lock:
+            namespace = self._namespaces.get(name)
+            if namespace is not None:
+                self._namespaces.move_to_end(name)
+                namespace.users += 1
+            return namespace
+
+    def _acquire(self, name):
+        while True:
+            with self._lock:
+                namespace = self._namespaces.get(name)
+                if namespace is not None:
+                    self._namespaces.move_to_end(name)
+                    namespace.users += 1
+                    return namespace
+                loading = self._loading.get(name)
+                if loading is None:
+                    loading = self._loading[name] = Future()
+                    break
+            # Another thread is loading it; pin it once it's there
+            loading.result()
+
+        try:
+            namespace = Namespace(name, self.root, **self.index_options)
+            namespace.index.get()
+        except BaseException as e:
+            with self._lock:
+                del self._loading[name]
+            loading.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._loading[name]
+            self._namespaces[name] = namespace
+            namespace.users += 1
+        loading.set_result(namespace)
+        return namespace
+
+    def _release(self, name, namespace):
+        with self._lock:
+            namespace.users -= 1
+            # Writes and reloads happen while a namespace is in use
+            usage = namespace.memory_usage()
+            self.usage += usage - self._usage.get(name, 0)
+            self._usage[name] = usage
+            self._enforce_budget()
+
+    def _enforce_budget(self):
+        # Walk from least to most recently used, skipping pinned namespaces
+        for name in list(self._namespaces):
+            if self.usage <= self.memory_budget:
+                break
+            if self._namespaces[name].users:
+                continue
+            self.usage -= self._usage.pop(name, 0)
+            del self._namespaces[name]
+            self.evictions += 1
+
+    def totals(self):
+        """Indexed vectors and stored chunks across the loaded namespaces"""
+        with self._lock:
+            namespaces = list(self._namespaces.values())
+        return (
+            sum(ns.index.ntotal for ns in namespaces),
+            sum(len(ns.store) for ns in namespaces),
+        )
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded": len(self._namespaces),
+                "memory_bytes": self.usage,
+                "memory_budget_bytes": self.memory_budget,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,157 @@
+import json
+import os
+import re
+
+import numpy as np
+
+# Files of a sentence-transformers model repository the ONNX backend needs
+_MODEL_FILES = [
+    "onnx/model.onnx",
+    "tokenizer.json",
+    "sentence_bert_config.json",
+    "1_Pooling/config.json",
+]
+
+
+def resolve_model_dir(name):
+    """Local directory of a model, downloaded from the Hugging Face hub if needed.
+
+    Short names are looked up under ``sentence-transformers/`` like
+    ``SentenceTransformer`` does. Only the exported ONNX graph and the
+    tokenizer are fetched, so PyTorch is not needed.
+    """
+    if os.path.isdir(name):
+        return name
+    from huggingface_hub import snapshot_download
+    repo = name if "/" in name else f"sentence-transformers/{name}"
+    return snapshot_download(repo, allow_patterns=_MODEL_FILES)
+
+
+def _read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def quantize_model(source, target):
+    """Write an int8 dynamically quantized copy of an ONNX model"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # Several ingest processes may get here at once; each writes its own
+    # file and the last rename wins
+    tmp = f"{target[:-len('.onnx')]}.{os.getpid()}.tmp.onnx"
+    quantize_dynamic(source, tmp, weight_type=QuantType.QInt8)
+    os.replace(tmp, target)
+
+
+class OnnxEmbedder:
+    """A sentence-transformers model run by ONNX Runtime on the CPU.
+
+    Uses the ONNX export published with the model, optionally with int8
+    weights (quantized once and kept under ``cache_dir``), and reproduces
+    the model's pooling and normalization, so its vectors live in the same
+    space as ``SentenceTransformer.encode`` and can be searched against an
+    existing index. Texts are sorted by token count and batched with
+    similar lengths, so little compute is spent on padding.
+    """
+
+    def __init__(self, model, cache_dir, quantize=True, threads=0, batch_size=32,
+                 bucketing=True):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = resolve_model_dir(model)
+        path = os.path.join(model_dir, "onnx", "model.onnx")
+        if not os.path.exists(path):
+            path = os.path.join(model_dir, "model.onnx")
+
+        if quantize:
+            name = re.sub(r"[^A-Za-z0-9_.-]+", "_", model.strip("/"))
+            target = os.path.join(cache_dir, name, "model-int8.onnx")
+            if not os.path.exists(target):
+                quantize_model(path, target)
+            path = target
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if threads:
+            options.intra_op_num_threads = threads
+        # Idle worker threads would otherwise spin and steal the cores of
+        # the other ingest processes
+        options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+        self.session = ort.InferenceSession(
+            path, options, providers=["CPUExecutionProvider"]
+        )
+        self.inputs = {i.name for i in self.session.get_inputs()}
+
+        settings = _read_json(os.path.join(model_dir, "sentence_bert_config.json"), {})
+        pooling = _read_json(os.path.join(model_dir, "1_Pooling", "config.json"), {})
+        self.max_length = settings.get("max_seq_length", 512)
+        self.cls_pooling = pooling.get("pooling_mode_cls_token", False)
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.no_padding()
+        self.tokenizer.enable_truncation(self.max_length)
+
+        self.batch_size = batch_size
+        self.bucketing = bucketing
+        self.dim = None
+        # Real and padded tokens fed to the model, to gauge padding waste
+        self.tokens = 0
+        self.padded_tokens = 0
+
+    def get_sentence_embedding_dimension(self):
+        if self.dim is None:
+            self.dim = self.encode(["dimension probe"]).shape[1]
+        return self.dim
+
+    def _forward(self, encodings):
+        width = max(len(e.ids) for e in encodings)
+        ids = np.zeros((len(encodings), width), dtype=np.int64)
+        mask = np.zeros((len(encodings), width), dtype=np.int64)
+        for row, encoding in enumerate(encodings):
+            ids[row, :len(encoding.ids)] = encoding.ids
+            mask[row, :len(encoding.ids)] = 1
+        self.tokens += int(mask.sum())
+        self.padded_tokens += mask.size
+
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.inputs:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, feeds)[0]
+
+        if hidden.ndim == 2:
+            # The graph already pools
+            return hidden
+        if self.cls_pooling:
+            return hidden[:, 0]
+        weights = mask[:, :, None].astype(np.float32)
+        return (hidden * weights).sum(axis=1) / np.maximum(weights.sum(axis=1), 1e-9)
+
+    def encode(self, sentences, convert_to_numpy=True, batch_size=None, **kwargs):
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        if not sentences:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        batch_size = batch_size or self.batch_size
+
+        encodings = self.tokenizer.encode_batch(list(sentences))
+        order = np.arange(len(encodings))
+        if self.bucketing:
+            order = np.argsort([len(e.ids) for e in encodings], kind="stable")
+
+        vectors = None
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            pooled = self._forward([encodings[i] for i in rows])
+            if vectors is None:
+                vectors = np.empty((len(sentences), pooled.shape[1]), dtype=np.float32)
+            vectors[rows] = pooled
+
+        self.dim = vectors.shape[1]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
@@ -0,0 +1,56 @@
+import numpy as np
+
+
+def pack_context(query_vector, vectors, texts, token_budget, count_tokens,
+                 diversity=0.3, min_score=0.0, duplicate_threshold=0.95,
+                 separator_tokens=1, exempt=()):
+    """Choose which retrieved chunks go into the prompt.
+
+    Chunks are picked by maximal marginal relevance: each step takes the
+    chunk with the best ``(1 - diversity) * relevance - diversity *
+    redundancy``, where relevance is the cosine similarity to the query and
+    redundancy the highest similarity to a chunk already picked. Chunks
+    scoring below ``min_score`` against the query (unless their position is
+    in ``exempt``), or at least ``duplicate_threshold`` against a picked
+    chunk, are dropped. Chunks are
+    added while they fit in ``token_budget`` (counted with
+    ``count_tokens``, plus ``separator_tokens`` between chunks); a chunk
+    that does not fit is skipped in favour of smaller ones.
+
+    ``vectors`` are the L2-normalized chunk embeddings, aligned with
+    ``texts``. Returns positions into ``texts`` in the order picked.
+    """
+    if not len(texts) or token_budget <= 0:
+        return []
+
+    query = np.asarray(query_vector, dtype=np.float32).ravel()
+    norm = np.linalg.norm(query)
+    if norm:
+        query = query / norm
+    vectors = np.asarray(vectors, dtype=np.float32)
+
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+    redundancy = np.zeros(len(texts), dtype=np.float32)
+
+    candidates = [
+        p for p in range(len(texts)) if relevance[p] >= min_score or p in exempt
+    ]
+    picked = []
+    used = 0
+
+    while candidates:
+        scores = (1 - diversity) * relevance[candidates] - diversity * redundancy[candidates]
+        best = candidates.pop(int(np.argmax(scores)))
+
+        if picked and redundancy[best] >= duplicate_threshold:
+            continue
+        tokens = count_tokens(texts[best]) + (separator_tokens if picked else 0)
+        if used + tokens > token_budget:
+            continue
+
+        picked.append(best)
+        used += tokens
+        redundancy = np.maximum(redundancy, similarity[best])
+
+    return picked
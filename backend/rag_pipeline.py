@@ -1,25 +1,268 @@
-from chunker import run_chunking
-from embedder import build_embeddings
-from retriever import retrieve
-from llm import stream_generate
+from chunker import token_functions
+from config import (
+    ANSWER_CACHE,
+    ANSWER_CACHE_SIZE,
+    ANSWER_CACHE_THRESHOLD,
+    ANSWER_CACHE_TTL,
+    CONTEXT_ANSWER_TOKENS,
+    CONTEXT_DIVERSITY,
+    CONTEXT_DUPLICATE_THRESHOLD,
+    CONTEXT_MIN_SCORE,
+    DATA_DIR,
+    HYBRID_RETRIEVAL,
+    INDEX_MMAP,
+    INDEX_TYPE,
+    INDEX_STORAGE,
+    LLM_HISTORY_TOKENS,
+    LLM_MODEL,
+    LLM_NUM_CTX,
+    LLM_SESSION_CONTEXT_TOKENS,
+    LLM_SESSION_MAX_TOKENS,
+    LLM_SESSIONS,
+    LLM_TOKENIZER,
+    LLM_TOKENS_PER_WORD,
+    NAMESPACE_MEMORY_MB,
+    QUERY_BATCH_WINDOW_MS,
+    QUERY_BATCH_MAX,
+    RETRIEVAL_CACHE,
+    RETRIEVAL_CACHE_SIZE,
+    RETRIEVAL_K,
+)
+from answer_cache import SemanticAnswerCache
+from conversations import ConversationCache
+from batching import QueryBatcher
+from namespaces import NamespaceCache
+from embedder import encode_queries
+from retrieval_cache import RetrievalCache
+from retriever import NO_DOCUMENTS, search_batched
+from llm import build_prompt, build_transcript, stream_generate
+from packing import pack_context
+from streaming import aclosing
 
 class RAGPipeline:
 
-    def __init__(self):
-        self.chunks = []
+    def __init__(self, data_dir=DATA_DIR, memory_budget_mb=NAMESPACE_MEMORY_MB):
+        # One index + chunk store per namespace; cold ones are unloaded
+        # when the memory budget is exceeded and reloaded on demand
+        self.namespaces = NamespaceCache(
+            data_dir,
+            memory_budget_mb * 1024 * 1024,
+            mmap=INDEX_MMAP,
+            index_type=INDEX_TYPE,
+            storage=INDEX_STORAGE,
+        )
+        # Concurrent chat requests share query encoding and FAISS searches
+        self.queries = QueryBatcher(
+            encode_queries, window_ms=QUERY_BATCH_WINDOW_MS, max_batch=QUERY_BATCH_MAX
+        )
+        # Answers to earlier, near-identical questions
+        self.answers = SemanticAnswerCache(
+            ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL
+        ) if ANSWER_CACHE else None
+        # Chunk IDs of recent queries, so repeats skip encoding and search
+        self.retrievals = RetrievalCache(RETRIEVAL_CACHE_SIZE) if RETRIEVAL_CACHE else None
+        # Ollama context tokens of recent chat sessions
+        self.conversations = ConversationCache(LLM_SESSIONS)
+        # Counts (or conservatively estimates) prompt tokens for context packing
+        self.count_tokens = token_functions(LLM_TOKENIZER, LLM_TOKENS_PER_WORD)[0]
 
-    def ingest_document(self, file_path):
-        chunks = run_chunking(file_path)
-        build_embeddings(chunks, "./faiss.index")
-        self.chunks = chunks
+    def is_indexed(self, digest, namespace=None):
+        """Whether a file (by SHA-256) was already ingested into a namespace"""
+        with self.namespaces.use(namespace) as ns:
+            return ns.store.has_source(digest)
 
-    def retrieve_context(self, query):
-        return retrieve(query, "./faiss.index", self.chunks)
+    def index_chunks(self, chunks, embeddings, digest, namespace=None):
+        """Append already encoded chunks (dicts from chunk_pages) of the file
+        with SHA-256 ``digest`` to a namespace.
 
-    async def stream_answer(self, query, context):
+        Returns no IDs when another job indexed the same file meanwhile.
+        """
+        texts = [c["text"] for c in chunks]
+        with self.namespaces.use(namespace) as ns, ns.writing():
+            if ns.store.has_source(digest):
+                return []
+            ids = ns.store.add(texts, source=digest, metadata=_chunk_metadata(chunks))
+            ns.lexical.add(ids, texts)
+            ns.index.add(embeddings, ids)
+        return ids
+
+    async def encode(self, query, namespace=None, k=RETRIEVAL_K):
+        """Return ``(chunk IDs or None, lexical IDs, query vector)`` without
+        searching.
+
+        The chunk IDs are only known when the retrieval is cached; the
+        vector comes from the cache too or is encoded now.
+        """
+        async with self.namespaces.use_async(namespace) as ns:
+            key = RetrievalCache.key(ns.name, ns.version, query, k)
+        if self.retrievals is not None:
+            cached = self.retrievals.get(key)
+            if cached is not None:
+                return cached
+        return None, frozenset(), await self.queries.encode(query)
+
+    async def retrieve(self, query, namespace=None, k=RETRIEVAL_K, vector=None):
+        """Return ``(chunk IDs, lexical IDs, query vector)`` for a query.
+
+        The lexical IDs are those of the chunks BM25 ranked. Results are
+        memoized per namespace version, so a repeated query skips both
+        encoding and search until documents are added. Pass ``vector``
+        when the query was already encoded.
+        """
+        async with self.namespaces.use_async(namespace) as ns:
+            key = RetrievalCache.key(ns.name, ns.version, query, k)
+            if self.retrievals is not None:
+                cached = self.retrievals.get(key)
+                if cached is not None:
+                    return cached
+
+            if vector is None:
+                vector = await self.queries.encode(query)
+            lexical = ns.lexical if HYBRID_RETRIEVAL else None
+            ids, lexical_ids = await search_batched(
+                query, ns.index, self.queries, k, lexical=lexical, vector=vector
+            )
+
+        result = (tuple(ids), lexical_ids, vector)
+        if self.retrievals is not None:
+            self.retrievals.put(key, result)
+        return result
+
+    def context(self, query, ids, vector, namespace=None, reserved=0,
+                window=LLM_NUM_CTX, limit=None, lexical_ids=()):
+        """Pack retrieved chunks into the prompt's token budget.
+
+        Near-duplicate and weakly related chunks are dropped using the
+        embeddings already stored for them (see ``packing.pack_context``);
+        chunks in ``lexical_ids`` matched the query's terms and are kept
+        however low their embedding similarity.
+        The prompt and the answer room fit in ``window`` tokens, of which
+        ``reserved`` are taken by earlier turns; ``limit`` caps the context.
+        """
+        with self.namespaces.use(namespace) as ns:
+            if not ns.index.ntotal:
+                return [NO_DOCUMENTS]
+            ids, vectors = ns.index.lookup(ids)
+            texts = [ns.store.get_text(i) for i in ids]
+
+        keep = [p for p, text in enumerate(texts) if text is not None]
+        texts, vectors = [texts[p] for p in keep], vectors[keep]
+        exempt = {n for n, p in enumerate(keep) if int(ids[p]) in lexical_ids}
+
+        budget = (
+            window - CONTEXT_ANSWER_TOKENS - reserved
+            - self.count_tokens(build_prompt(query, ""))
+        )
+        if limit is not None:
+            budget = min(budget, limit)
+        picked = pack_context(
+            vector, vectors, texts, budget, self.count_tokens,
+            diversity=CONTEXT_DIVERSITY,
+            min_score=CONTEXT_MIN_SCORE,
+            duplicate_threshold=CONTEXT_DUPLICATE_THRESHOLD,
+            exempt=exempt,
+        )
+        return [texts[p] for p in picked]
+
+    async def stream_answer(self, query, context, transcript="", conversation=None,
+                            on_done=None):
         ctx = "\n\n".join(context)
-        async for token in stream_generate("llama3:8b", query, ctx):
-            yield token
+        generation = stream_generate(LLM_MODEL, query, ctx, transcript, conversation, on_done)
+        async with aclosing(generation):
+            async for token in generation:
+                yield token
+
+    def _transcript(self, history):
+        """The most recent turns that fit in LLM_HISTORY_TOKENS, as text"""
+        turns, used = [], 0
+        for role, content in reversed(history):
+            tokens = self.count_tokens(build_transcript([(role, content)]))
+            if used + tokens > LLM_HISTORY_TOKENS:
+                break
+            turns.append((role, content))
+            used += tokens
+        return build_transcript(reversed(turns)), used
+
+    async def prepare(self, query, namespace=None, history=()):
+        """Everything of an answer that needs no LLM: ``(cached, retrieval)``.
+
+        Returns a cached answer to replay, or None and the retrieval to pass
+        to ``generate``, so callers only wait for a generation slot when
+        the model is actually needed. The query is encoded once (or not at
+        all on a retrieval cache hit), for both the answer cache lookup and
+        the dense search; the search only runs when no cached answer
+        matches. Cached answers are only used for the first question of a
+        conversation.
+        """
+        ids, lexical_ids, vector = await self.encode(query, namespace)
+        async with self.namespaces.use_async(namespace) as ns:
+            name, version = ns.name, ns.version
+        if self.answers is not None and not history:
+            cached = self.answers.get(name, version, vector)
+            if cached is not None:
+                return cached, None
+        if ids is None:
+            ids, lexical_ids, vector = await self.retrieve(query, namespace, vector=vector)
+        return None, (ids, lexical_ids, vector, name, version)
+
+    async def generate(self, query, retrieval, namespace=None, history=(), session_id=None):
+        """Stream the LLM answer for a retrieval from ``prepare``.
+
+        Only answers that were generated completely are cached. ``history``
+        holds the earlier (role, content) turns. Within a session, the
+        context tokens Ollama returned for the previous turn are sent back
+        so the model reuses its evaluated prefix; otherwise recent turns
+        are included as text. Session turns are packed so that the state
+        they leave stays within LLM_SESSION_MAX_TOKENS.
+        """
+        history = list(history)
+        ids, lexical_ids, vector, name, version = retrieval
+
+        conversation, transcript, reserved = None, "", 0
+        window, limit = LLM_NUM_CTX, None
+        if session_id:
+            window = min(window, LLM_SESSION_MAX_TOKENS)
+            limit = LLM_SESSION_CONTEXT_TOKENS
+        if history:
+            if session_id:
+                conversation = self.conversations.get(session_id, history)
+            turn = (
+                self.count_tokens(build_prompt(query, "")) + LLM_SESSION_CONTEXT_TOKENS
+                + CONTEXT_ANSWER_TOKENS
+            )
+            if conversation is not None and len(conversation) + turn <= window:
+                reserved = len(conversation)
+            else:
+                # Start the session state over from the recent turns
+                conversation = None
+                transcript, reserved = self._transcript(history)
+
+        # Reloaded off the event loop if it was evicted since ``prepare``
+        async with self.namespaces.use_async(namespace):
+            context = self.context(
+                query, ids, vector, namespace, reserved, window, limit, lexical_ids
+            )
+        tokens = []
+        final = {}
+        generation = self.stream_answer(query, context, transcript, conversation, final.update)
+        try:
+            async with aclosing(generation):
+                async for token in generation:
+                    tokens.append(token)
+                    yield token
+        except Exception as e:
+            yield f"Error generating response: {str(e)}"
+            return
+
+        answer = "".join(tokens)
+        if session_id and final.get("context"):
+            turns = history + [("user", query), ("assistant", answer)]
+            self.conversations.put(session_id, turns, final["context"])
+        if self.answers is not None and not history and tokens:
+            self.answers.put(name, version, query, vector, answer)
+
+def _chunk_metadata(chunks):
+    return [{"pages": c["pages"]} for c in chunks]
 
 
 
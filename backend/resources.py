@@ -0,0 +1,64 @@
+import threading
+import time
+
+# Every heavy dependency of the process, in registration order
+RESOURCES = []
+
+
+class LazyResource:
+    """A heavy dependency (model, corpus data) loaded on first use.
+
+    Importing a module that declares one costs nothing; the loader runs
+    once per process, when ``get()`` is first called or on ``warm_up()``,
+    and its load time is kept for the readiness endpoint. A failed load is
+    retried on the next call.
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.seconds = None
+        self.error = None
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        RESOURCES.append(self)
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                start = time.perf_counter()
+                try:
+                    self._value = self.loader()
+                except Exception as e:
+                    self.error = str(e)
+                    raise
+                self.seconds = time.perf_counter() - start
+                self.error = None
+                self._loaded = True
+                print(f"Loaded {self.name} in {self.seconds:.2f} s")
+        return self._value
+
+    def status(self):
+        seconds = None if self.seconds is None else round(self.seconds, 3)
+        return {"loaded": self._loaded, "seconds": seconds, "error": self.error}
+
+
+def warm_up():
+    """Load every registered resource now; failures are reported, not raised"""
+    for resource in RESOURCES:
+        try:
+            resource.get()
+        except Exception as e:
+            print(f"Error loading {resource.name}: {str(e)}")
+    return status()
+
+
+def status():
+    return {resource.name: resource.status() for resource in RESOURCES}
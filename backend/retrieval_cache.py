@@ -0,0 +1,61 @@
+import threading
+from collections import OrderedDict
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a query, used in cache keys"""
+    return " ".join(query.lower().split())
+
+
+class RetrievalCache:
+    """Bounded LRU of retrieval results.
+
+    Keys are ``(namespace, version, normalized query, k)``, so results of a
+    namespace stop matching as soon as documents are added to it; the
+    stale entries age out of the LRU. Values are whatever the caller
+    stores, here the chunk IDs, those BM25 ranked and the query vector. All
+    operations are synchronous and guarded by a lock, so they are safe to
+    call from concurrent coroutines and worker threads alike.
+    """
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(namespace, version, query, k):
+        return (namespace, version, normalize_query(query), k)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+            }
@@ -1,13 +1,308 @@
-from embedder import search_embeddings
+from array import array
+from collections import Counter
+import asyncio
+import math
 import os
+import re
+import threading
+import uuid
 
-def retrieve(query, index_path, chunks):
-    # Check if index exists
-    if not os.path.exists(index_path):
-        return ["No documents ingested yet. Please upload documents first."]
-    
-    if not chunks:
-        return ["No documents ingested yet. Please upload documents first."]
-    
-    idxs = search_embeddings(query, index_path, k=5)
-    return [chunks[i] for i in idxs]
+import numpy as np
+
+from config import BM25_MAX_SEGMENTS
+from locks import file_lock
+from metrics import Histogram
+
+NO_DOCUMENTS = "No documents ingested yet. Please upload documents first."
+
+RETRIEVAL_SECONDS = Histogram(
+    "mindsearch_retrieval_seconds",
+    "Time to retrieve the chunk IDs for one query (encoding, dense and BM25 search)",
+)
+
+# Words, numbers and compound identifiers such as "err-404" or "v2.1.0"
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+_PART = re.compile(r"[a-z0-9]+")
+
+def tokenize(text):
+    """Lowercase terms; compound identifiers are also indexed by their parts"""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        parts = _PART.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+class _Stale(Exception):
+    """Segments were merged away before this process read them"""
+
+class BM25Index:
+    """Incremental BM25 inverted index with compact array-backed postings.
+
+    Each term's postings are two ``array('I')`` buffers (document numbers
+    and term frequencies) that grow in place as chunks are added, so
+    indexing a new document never touches existing postings. Searches view
+    the buffers as numpy arrays without copying.
+
+    On disk the index is a CSR-style ``.npz`` base file plus append-only
+    segments: every ``add`` writes only its own chunks as a segment named
+    after its first document number, and once more than ``max_segments``
+    exist they are merged into a new base. Other processes read just the
+    segments they have not seen; a change of the directory mtime tells
+    them to look.
+    """
+
+    def __init__(self, path, k1=1.5, b=0.75, max_segments=BM25_MAX_SEGMENTS):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.max_segments = max_segments
+        self._dir = os.path.dirname(path) or "."
+        self._prefix = os.path.splitext(os.path.basename(path))[0] + "."
+        self._mtime = None
+        self._lock = threading.RLock()
+        self._reset()
+        self._load()
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def _reset(self):
+        self.terms = {}
+        self.postings = []  # term id -> (doc numbers, term frequencies)
+        self.doc_ids = array("q")  # doc number -> chunk id
+        self.doc_lens = array("I")
+        self.total_len = 0
+        # Posting entries across all terms, for memory_usage
+        self.n_postings = 0
+        # Documents in the base file and segments written after it
+        self._base_docs = 0
+        self.segments = 0
+        self._base_mtime = None
+
+    def _stat(self, path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _segment_files(self):
+        """``(first document number, path)`` of every segment, in order"""
+        segments = []
+        for name in os.listdir(self._dir):
+            start = name[len(self._prefix):-len(".npz")]
+            if name.startswith(self._prefix) and name.endswith(".npz") and start.isdigit():
+                segments.append((int(start), os.path.join(self._dir, name)))
+        return sorted(segments)
+
+    def _load(self):
+        """Read what other processes wrote since the last look"""
+        mtime = self._stat(self._dir)
+        if mtime is None or mtime == self._mtime:
+            return
+        try:
+            self._read_changes()
+        except (FileNotFoundError, _Stale):
+            # A merge replaced segments this process had not read yet
+            self._reset()
+            self._read_changes()
+        self._mtime = mtime
+
+    def _read_changes(self):
+        base = self._stat(self.path)
+        if base != self._base_mtime:
+            self._reset()
+            if base is not None:
+                self._read(self.path)
+            self._base_docs = len(self.doc_ids)
+            self._base_mtime = base
+
+        self.segments = 0
+        for start, path in self._segment_files():
+            if start > len(self.doc_ids):
+                raise _Stale()
+            if start == len(self.doc_ids):
+                self._read(path)
+            if start >= self._base_docs:
+                self.segments += 1
+
+    def _read(self, path):
+        """Append the documents of a base or segment file"""
+        with np.load(path) as data:
+            terms = data["terms"].tobytes().decode("utf-8").split("\n")
+            offsets = data["offsets"]
+            docs = data["docs"]
+            tfs = data["tfs"]
+
+            for i, term in enumerate(terms):
+                if not term:
+                    # An empty file
+                    continue
+                start, end = offsets[i], offsets[i + 1]
+                term_docs, term_tfs = self._postings_of(term)
+                term_docs.frombytes(docs[start:end].tobytes())
+                term_tfs.frombytes(tfs[start:end].tobytes())
+            self.n_postings += len(docs)
+            self.doc_ids.frombytes(data["doc_ids"].tobytes())
+            self.doc_lens.frombytes(data["doc_lens"].tobytes())
+            self.total_len += int(data["doc_lens"].sum())
+
+    def _postings_of(self, term):
+        term_id = self.terms.get(term)
+        if term_id is None:
+            term_id = self.terms[term] = len(self.postings)
+            self.postings.append((array("I"), array("I")))
+        return self.postings[term_id]
+
+    def add(self, chunk_ids, texts):
+        """Index chunks under their chunk IDs and persist them as a segment"""
+        with self._lock, file_lock(f"{self.path}.lock"):
+            self._load()
+            first = len(self.doc_ids)
+            segment = {}
+            for chunk_id, text in zip(chunk_ids, texts):
+                doc = len(self.doc_ids)
+                counts = Counter(tokenize(text))
+                for term, tf in counts.items():
+                    docs, tfs = self._postings_of(term)
+                    docs.append(doc)
+                    tfs.append(tf)
+                    segment.setdefault(term, []).append((doc, tf))
+                self.n_postings += len(counts)
+
+                length = sum(counts.values())
+                self.doc_ids.append(int(chunk_id))
+                self.doc_lens.append(length)
+                self.total_len += length
+
+            self._write(
+                os.path.join(self._dir, f"{self._prefix}{first:012d}.npz"),
+                {term: tuple(zip(*entries)) for term, entries in segment.items()},
+                self.doc_ids[first:],
+                self.doc_lens[first:],
+            )
+            self.segments += 1
+            if self.segments > self.max_segments:
+                self._merge()
+            self._mtime = self._stat(self._dir)
+
+    def _merge(self):
+        """Write everything as a new base file and drop the segments"""
+        self._write(
+            self.path,
+            {term: self.postings[term_id] for term, term_id in self.terms.items()},
+            self.doc_ids,
+            self.doc_lens,
+        )
+        self._base_mtime = self._stat(self.path)
+        self._base_docs = len(self.doc_ids)
+        for start, path in self._segment_files():
+            if start < self._base_docs:
+                os.remove(path)
+        self.segments = 0
+
+    def _write(self, path, postings, doc_ids, doc_lens):
+        """Write ``{term: (doc numbers, term frequencies)}`` as a CSR file"""
+        terms = list(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        np.cumsum([len(postings[t][0]) for t in terms], out=offsets[1:])
+
+        # Write next to the live file and swap it in atomically
+        tmp_path = f"{self.path}.{uuid.uuid4().hex}.tmp.npz"
+        np.savez(
+            tmp_path,
+            terms=np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8),
+            offsets=offsets,
+            docs=np.concatenate([np.asarray(postings[t][0], dtype=np.uint32) for t in terms])
+            if terms else np.zeros(0, dtype=np.uint32),
+            tfs=np.concatenate([np.asarray(postings[t][1], dtype=np.uint32) for t in terms])
+            if terms else np.zeros(0, dtype=np.uint32),
+            doc_ids=np.frombuffer(doc_ids, dtype=np.int64),
+            doc_lens=np.frombuffer(doc_lens, dtype=np.uint32),
+        )
+        os.replace(tmp_path, path)
+
+    def search(self, query, k=5):
+        """Return ``(chunk ids, scores)`` of the top-k chunks by BM25 score"""
+        with self._lock:
+            self._load()
+            n_docs = len(self.doc_ids)
+            if not n_docs:
+                return [], []
+
+            avg_len = self.total_len / n_docs
+            doc_lens = np.frombuffer(self.doc_lens, dtype=np.uint32)
+            doc_parts, score_parts = [], []
+
+            for term in set(tokenize(query)):
+                term_id = self.terms.get(term)
+                if term_id is None:
+                    continue
+                docs = np.frombuffer(self.postings[term_id][0], dtype=np.uint32)
+                tfs = np.frombuffer(self.postings[term_id][1], dtype=np.uint32).astype(np.float32)
+
+                df = len(docs)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * doc_lens[docs] / avg_len)
+                doc_parts.append(docs)
+                score_parts.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+
+            if not doc_parts:
+                return [], []
+
+            # Sum per-term contributions over the touched documents only
+            docs, inverse = np.unique(np.concatenate(doc_parts), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+
+            if len(scores) > k:
+                top = np.argpartition(-scores, k)[:k]
+            else:
+                top = np.arange(len(scores))
+            top = top[np.argsort(-scores[top])]
+
+            doc_ids = np.frombuffer(self.doc_ids, dtype=np.int64)
+            return doc_ids[docs[top]].tolist(), scores[top].tolist()
+
+    def memory_usage(self):
+        # Two 4-byte entries per posting, an 8-byte chunk ID and a length per doc
+        return self.n_postings * 8 + len(self.doc_ids) * 12
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse ranked ID lists: each ID scores the sum of 1 / (k + rank)"""
+    fused = Counter()
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking, start=1):
+            fused[chunk_id] += 1.0 / (k + rank)
+    return [chunk_id for chunk_id, _ in fused.most_common()]
+
+async def search_batched(query, index_manager, batcher, k=5, lexical=None,
+                         candidates=20, vector=None):
+    """Return ``(top k chunk IDs, those of them BM25 ranked)``, encoding and
+    searching together with concurrent queries.
+
+    With a ``lexical`` BM25 index, the top ``candidates`` dense and BM25 hits
+    are fused with reciprocal rank fusion before the top k are kept. Pass
+    the query ``vector`` if it was already encoded.
+    """
+    if not index_manager.ntotal:
+        return [], frozenset()
+
+    depth = max(k, candidates) if lexical is not None else k
+
+    async def dense():
+        query_vector = vector if vector is not None else await batcher.encode(query)
+        scores, ids = await batcher.search(index_manager, query_vector, depth)
+        # FAISS pads with -1 when the index holds fewer than k vectors
+        return [int(i) for i in ids if i != -1]
+
+    with RETRIEVAL_SECONDS.time():
+        if lexical is None:
+            return await dense(), frozenset()
+
+        loop = asyncio.get_running_loop()
+        dense_ids, (lexical_ids, _) = await asyncio.gather(
+            dense(), loop.run_in_executor(None, lexical.search, query, depth)
+        )
+        ids = reciprocal_rank_fusion([dense_ids, lexical_ids])[:k]
+        return ids, frozenset(lexical_ids).intersection(ids)
@@ -0,0 +1,135 @@
+import asyncio
+from collections import OrderedDict, deque
+
+
+class QueueFull(Exception):
+    """Raised when the wait queue of the scheduler is full"""
+
+
+class Ticket:
+    """A request's claim on a generation slot (see FairScheduler.enqueue)"""
+
+    def __init__(self, scheduler, user):
+        self.scheduler = scheduler
+        self.user = user
+        self.admitted = False
+        self.released = False
+        self._changed = asyncio.Event()
+
+    async def wait(self):
+        """Yield the 1-based queue position whenever it changes, until admitted"""
+        last = None
+        while not self.admitted:
+            position = self.scheduler.position(self)
+            if position != last:
+                yield position
+                last = position
+            self._changed.clear()
+            await self._changed.wait()
+
+    def release(self):
+        self.scheduler.release(self)
+
+
+class FairScheduler:
+    """Admission control for LLM generations.
+
+    At most ``concurrency`` generations run at once. Further requests wait
+    in per-user queues that are served round-robin, so one user sending
+    many requests cannot starve the others; once ``max_queued`` requests
+    are waiting, new ones are rejected with :class:`QueueFull` right away.
+    Meant to be used from the event loop only.
+    """
+
+    def __init__(self, concurrency=2, max_queued=64):
+        self.concurrency = concurrency
+        self.max_queued = max_queued
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        # user -> their waiting tickets; the first user is served next
+        self._queues = OrderedDict()
+
+    def enqueue(self, user=None):
+        """Return a ticket, admitted right away if a slot is free.
+
+        Every ticket must be released once its generation ends or the
+        request goes away, whether it was admitted or not.
+        """
+        ticket = Ticket(self, user or "anonymous")
+        if self.running < self.concurrency and not self.waiting:
+            self._admit(ticket)
+            return ticket
+        if self.waiting >= self.max_queued:
+            self.rejected += 1
+            raise QueueFull(f"{self.waiting} requests already waiting")
+
+        self._queues.setdefault(ticket.user, deque()).append(ticket)
+        self.waiting += 1
+        return ticket
+
+    def _admit(self, ticket):
+        ticket.admitted = True
+        self.running += 1
+        self.admitted += 1
+        ticket._changed.set()
+
+    def _dispatch(self):
+        while self.running < self.concurrency and self._queues:
+            user, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            self.waiting -= 1
+            if queue:
+                self._queues.move_to_end(user)
+            else:
+                del self._queues[user]
+            self._admit(ticket)
+
+        # Positions of everyone still waiting may have moved
+        for queue in self._queues.values():
+            for ticket in queue:
+                ticket._changed.set()
+
+    def release(self, ticket):
+        if ticket.released:
+            return
+        ticket.released = True
+
+        if ticket.admitted:
+            self.running -= 1
+        else:
+            queue = self._queues[ticket.user]
+            queue.remove(ticket)
+            self.waiting -= 1
+            if not queue:
+                del self._queues[ticket.user]
+        self._dispatch()
+
+    def position(self, ticket):
+        """1-based place of a waiting ticket in the admission order (0 if admitted)"""
+        queue = self._queues.get(ticket.user)
+        if ticket.admitted or queue is None:
+            return 0
+
+        # Round-robin: every user ahead in the rotation gets one more turn
+        index = queue.index(ticket)
+        ahead = index
+        before = True
+        for user, other in self._queues.items():
+            if user == ticket.user:
+                before = False
+                continue
+            ahead += min(len(other), index + 1 if before else index)
+        return ahead + 1
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "running": self.running,
+            "waiting": self.waiting,
+            "waiting_users": len(self._queues),
+            "max_queued": self.max_queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,170 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+from starlette.responses import StreamingResponse
+
+# An OpenAI-style chunk is fixed apart from its content string, so frames are
+# built from a pre-serialized template and only the content gets encoded
+_FRAME_PREFIX = 'data: {"choices":[{"delta":{"content":'
+_FRAME_SUFFIX = "}}]}\n\n"
+_encode_string = json.encoder.encode_basestring_ascii
+
+DONE_FRAME = "data: [DONE]\n\n"
+
+_END = object()
+
+
+@asynccontextmanager
+async def aclosing(generator):
+    """Close an async generator when the block exits (contextlib.aclosing
+    is only available from Python 3.10).
+
+    Leaving an ``async for`` early does not close the generator it reads;
+    without this, generators further down the chain (up to the Ollama
+    request) are only closed once they are garbage collected.
+    """
+    try:
+        yield generator
+    finally:
+        await generator.aclose()
+
+
+def sse_frame(content):
+    """Serialize one chat completion chunk as an SSE ``data:`` frame"""
+    return _FRAME_PREFIX + _encode_string(content) + _FRAME_SUFFIX
+
+
+def queue_frame(position):
+    """Tell the client where its request stands in the generation queue"""
+    return f'data: {{"queue":{{"position":{int(position)}}}}}\n\n'
+
+
+def error_frame(message):
+    return f"data: {json.dumps({'error': message})}\n\n"
+
+
+async def coalesce(tokens, flush_ms, flush_bytes, max_pending=256):
+    """Group an async stream of tokens into larger pieces.
+
+    A piece is yielded once ``flush_ms`` milliseconds have passed since its
+    first token or once it holds ``flush_bytes`` bytes, whichever comes
+    first. The tokens are read by a separate task, so a slow model never
+    holds back a piece past its deadline and a fast one is never throttled.
+    At most ``max_pending`` tokens are buffered, so a slow client slows the
+    upstream read down instead of growing the buffer. Errors raised by
+    ``tokens`` are re-raised after the pending piece.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=max_pending)
+
+    async def produce():
+        try:
+            async for token in tokens:
+                await queue.put(token)
+        except asyncio.CancelledError:
+            # The reader is going away: never wait for room in a full
+            # queue, and close the upstream right now
+            try:
+                queue.put_nowait(_END)
+            except asyncio.QueueFull:
+                pass
+            if hasattr(tokens, "aclose"):
+                await tokens.aclose()
+            raise
+        except BaseException:
+            await queue.put(_END)
+            raise
+        await queue.put(_END)
+
+    producer = asyncio.create_task(produce())
+    try:
+        done = False
+        while not done:
+            token = await queue.get()
+            if token is _END:
+                break
+
+            parts = [token]
+            size = len(token.encode("utf-8"))
+            deadline = loop.time() + flush_ms / 1000
+            while size < flush_bytes:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    token = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if token is _END:
+                    done = True
+                    break
+                parts.append(token)
+                size += len(token.encode("utf-8"))
+
+            yield "".join(parts)
+
+        # Surface an exception raised while producing tokens
+        await producer
+    finally:
+        # Wait for the upstream to be closed, not just for it to be asked to
+        producer.cancel()
+        await asyncio.gather(producer, return_exceptions=True)
+
+
+async def until_disconnected(request, frames, poll_interval=0.5):
+    """Relay ``frames`` until the client goes away, then cancel them.
+
+    Writes alone only notice a dropped client once the next frame is sent,
+    which can take a while when a request is queued or the model is still
+    reading its prompt. The connection is therefore also polled every
+    ``poll_interval`` seconds; on disconnect the pending step of ``frames``
+    is cancelled, which unwinds the pipeline down to the Ollama request.
+    """
+    async def watch():
+        while not await request.is_disconnected():
+            await asyncio.sleep(poll_interval)
+
+    watcher = asyncio.create_task(watch())
+    step = None
+    try:
+        while True:
+            step = asyncio.ensure_future(frames.__anext__())
+            await asyncio.wait({step, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if not step.done():
+                step.cancel()
+                await asyncio.gather(step, return_exceptions=True)
+                return
+            try:
+                frame = step.result()
+            except StopAsyncIteration:
+                return
+            yield frame
+    finally:
+        watcher.cancel()
+        # Cancelled from outside (e.g. by the server's own disconnect
+        # handling) while a step is running: ``frames`` cannot be closed
+        # before that step has unwound
+        if step is not None and not step.done():
+            step.cancel()
+            await asyncio.gather(step, return_exceptions=True)
+        await frames.aclose()
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """A ``StreamingResponse`` that calls ``on_close()`` however it ends.
+
+    A generator's own ``finally`` never runs if the response fails before
+    the body is iterated (e.g. the client is gone when the headers are
+    sent), so resources taken for the stream must be released here.
+    """
+
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
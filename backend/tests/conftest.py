@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+
+# The backend modules import each other by their flat names
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Settings are read at import time; keep data out of the working tree and
+# use the download-free embeddings
+_root = tempfile.mkdtemp()
+os.environ.setdefault("MINDSEARCH_DATA_DIR", os.path.join(_root, "data"))
+os.environ.setdefault("MINDSEARCH_UPLOAD_DIR", os.path.join(_root, "uploads"))
+os.environ.setdefault("MINDSEARCH_EMBEDDING_BACKEND", "hash")
+os.environ.setdefault("MINDSEARCH_WARM_UP", "false")
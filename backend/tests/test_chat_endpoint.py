@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+import main
+
+
+def stub_pipeline(monkeypatch):
+    async def prepare(query, namespace=None, history=()):
+        return None, ((), None, "default", 0)
+
+    async def generate(query, retrieval, namespace=None, history=(), session_id=None):
+        for token in ["Hello", " world"]:
+            yield token
+
+    monkeypatch.setattr(main.rag, "prepare", prepare)
+    monkeypatch.setattr(main.rag, "generate", generate)
+
+
+async def call_chat(send):
+    body = json.dumps({"messages": [{"role": "user", "content": "hi"}]}).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0", "spec_version": "2.3"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/v1/chat/completions",
+        "raw_path": b"/v1/chat/completions",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json")],
+        "client": ("127.0.0.1", 1),
+        "server": ("127.0.0.1", 80),
+    }
+    requests = [{"type": "http.request", "body": body, "more_body": False}]
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        # The client stays connected
+        await asyncio.Event().wait()
+
+    await main.app(scope, receive, send)
+
+
+def test_stream_releases_its_generation_slot(monkeypatch):
+    stub_pipeline(monkeypatch)
+    frames = []
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            frames.append(message.get("body", b""))
+
+    asyncio.run(call_chat(send))
+
+    body = b"".join(frames).decode()
+    assert "Hello" in body and body.endswith("data: [DONE]\n\n")
+    assert main.llm_scheduler.running == 0
+
+
+def test_slot_is_released_when_the_response_never_starts(monkeypatch):
+    stub_pipeline(monkeypatch)
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            raise OSError("client went away")
+
+    try:
+        asyncio.run(call_chat(send))
+    except OSError:
+        pass
+
+    stats = main.llm_scheduler.stats()
+    assert stats["running"] == 0 and stats["waiting"] == 0
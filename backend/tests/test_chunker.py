@@ -0,0 +1,60 @@
+import pytest
+
+from chunker import chunk_sentences
+
+
+def words(start, stop):
+    return " ".join(f"w{i}" for i in range(start, stop))
+
+
+def texts(chunks):
+    return [chunk["text"].split() for chunk in chunks]
+
+
+def test_sentences_are_packed_with_whole_sentence_overlap():
+    sentences = [(1, words(0, 4)), (1, words(4, 8)), (2, words(8, 12))]
+    chunks = chunk_sentences(sentences, chunk_size=8, overlap=4)
+
+    assert texts(chunks) == [words(0, 8).split(), words(4, 12).split()]
+    assert [chunk["pages"] for chunk in chunks] == [[1], [1, 2]]
+
+
+def test_overlap_cuts_into_a_long_last_sentence():
+    sentences = [(1, words(0, 6)), (1, words(6, 10))]
+    chunks = chunk_sentences(sentences, chunk_size=8, overlap=2)
+
+    assert texts(chunks) == [words(0, 6).split(), words(4, 10).split()]
+
+
+def test_long_sentence_fills_the_current_chunk_then_overlaps():
+    sentences = [(1, words(0, 3)), (2, words(3, 23)), (3, words(23, 25))]
+    chunks = chunk_sentences(sentences, chunk_size=8, overlap=3)
+
+    assert texts(chunks) == [
+        words(0, 8).split(),
+        words(5, 13).split(),
+        words(10, 18).split(),
+        words(15, 23).split(),
+        words(20, 25).split(),
+    ]
+    assert [chunk["pages"] for chunk in chunks] == [[1, 2], [2], [2], [2], [2, 3]]
+
+
+def test_every_word_is_kept_and_chunks_respect_the_budget():
+    sentences = [(1, words(0, 5)), (1, words(5, 40)), (1, words(40, 43)), (2, words(43, 70))]
+    for overlap in range(0, 10):
+        chunks = chunk_sentences(sentences, chunk_size=10, overlap=overlap)
+
+        assert all(len(chunk) <= 10 for chunk in texts(chunks))
+        covered = [w for chunk in texts(chunks) for w in chunk]
+        assert sorted(set(covered), key=lambda w: int(w[1:])) == words(0, 70).split()
+        for previous, chunk in zip(texts(chunks), texts(chunks)[1:]):
+            # Each chunk starts with the tail of the previous one
+            shared = len(previous) + len(chunk) - len(set(previous + chunk))
+            assert shared <= overlap
+            assert chunk[:shared] == previous[len(previous) - shared:]
+
+
+def test_overlap_must_be_smaller_than_the_chunk():
+    with pytest.raises(ValueError):
+        chunk_sentences([(1, "a b")], chunk_size=4, overlap=4)
@@ -0,0 +1,40 @@
+import asyncio
+import threading
+
+import namespaces
+from namespaces import NamespaceCache
+
+
+def test_loads_off_the_event_loop_once(monkeypatch, tmp_path):
+    loading = threading.Event()
+    proceed = threading.Event()
+    built = []
+    original = namespaces.Namespace
+
+    def slow_namespace(*args, **kwargs):
+        built.append(args[0])
+        loading.set()
+        proceed.wait(5)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(namespaces, "Namespace", slow_namespace)
+    cache = NamespaceCache(str(tmp_path), 1 << 30)
+
+    async def use():
+        async with cache.use_async("tenant") as ns:
+            return ns
+
+    async def main():
+        tasks = [asyncio.create_task(use()) for _ in range(3)]
+        await asyncio.to_thread(loading.wait, 5)
+        # The event loop and the cache lock stay free during the load
+        await asyncio.sleep(0)
+        assert cache.stats()["loaded"] == 0
+        proceed.set()
+        return await asyncio.gather(*tasks)
+
+    loaded = asyncio.run(main())
+    assert built == ["tenant"]
+    assert loaded[0] is loaded[1] is loaded[2]
+    assert loaded[0].users == 0
+    assert cache.stats()["loaded"] == 1
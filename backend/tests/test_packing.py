@@ -0,0 +1,16 @@
+import numpy as np
+
+from packing import pack_context
+
+
+def test_min_score_spares_exempt_chunks():
+    query = np.array([1.0, 0.0], dtype=np.float32)
+    # Related, unrelated and unrelated but lexically matched
+    vectors = np.array([[1.0, 0.0], [0.0, 1.0], [0.0, 1.0]], dtype=np.float32)
+    texts = ["dense hit", "weak hit", "bm25 hit"]
+
+    picked = pack_context(
+        query, vectors, texts, 100, lambda t: len(t.split()),
+        min_score=0.2, duplicate_threshold=1.1, exempt={2},
+    )
+    assert sorted(picked) == [0, 2]
@@ -0,0 +1,24 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+
+
+def test_ready_after_warm_up(monkeypatch):
+    loaded = threading.Event()
+    monkeypatch.setattr(main, "WARM_UP", True)
+    monkeypatch.setattr(main.resources, "warm_up", lambda: loaded.wait(5))
+    # Module-wide pools, still needed by other tests
+    monkeypatch.setattr(main.ingest_jobs, "shutdown", lambda: None)
+    monkeypatch.setattr(main.rag.queries, "shutdown", lambda: None)
+
+    with TestClient(main.app) as client:
+        assert client.get("/ready").status_code == 503
+        loaded.set()
+        for _ in range(50):
+            if client.get("/ready").status_code == 200:
+                break
+            time.sleep(0.05)
+        assert client.get("/ready").json()["ready"]
@@ -0,0 +1,50 @@
+import asyncio
+
+import rag_pipeline
+from config import LLM_SESSION_MAX_TOKENS
+from embedder import encode_chunks
+from llm import build_prompt
+
+
+def test_session_state_is_reused_across_turns(tmp_path, monkeypatch):
+    sent = []
+
+    async def stream_generate(model, query, context, transcript="", conversation=None,
+                              on_done=None):
+        # Ollama's state: the earlier state, the new prompt and the answer
+        sent.append(conversation)
+        answer = ["word"] * 150
+        prompt = build_prompt(query, context, transcript).split()
+        for token in answer:
+            yield token + " "
+        on_done({"context": list(conversation or []) + [0] * (len(prompt) + len(answer))})
+
+    monkeypatch.setattr(rag_pipeline, "stream_generate", stream_generate)
+    pipeline = rag_pipeline.RAGPipeline(str(tmp_path))
+    chunks = [
+        {"text": " ".join(f"topic{i} detail{j}" for j in range(60)), "pages": [1]}
+        for i in range(40)
+    ]
+    pipeline.index_chunks(chunks, encode_chunks([c["text"] for c in chunks]), "doc.txt")
+
+    async def chat(turns):
+        history = []
+        for turn in range(turns):
+            query = f"what about topic{turn}?"
+            _, retrieval = await pipeline.prepare(query, history=history)
+            answer = "".join([
+                token async for token in
+                pipeline.generate(query, retrieval, history=history, session_id="s1")
+            ])
+            history += [("user", query), ("assistant", answer)]
+            state = pipeline.conversations.get("s1", history)
+            assert len(state) <= LLM_SESSION_MAX_TOKENS
+
+    asyncio.run(chat(12))
+
+    reused = [conversation is not None for conversation in sent]
+    assert reused[:4] == [False, True, True, True]
+    # Once the state is full the session starts over from the transcript,
+    # and the state of that turn is reused again
+    restart = reused.index(False, 1)
+    assert reused[restart + 1]
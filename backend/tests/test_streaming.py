@@ -0,0 +1,123 @@
+import asyncio
+
+from scheduler import FairScheduler
+from streaming import aclosing, coalesce, until_disconnected
+
+
+class FakeRequest:
+    def __init__(self):
+        self.disconnected = False
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+async def ticketed_frames(scheduler, released):
+    """Frames of a generation holding a scheduler slot, like the chat endpoint"""
+    ticket = scheduler.enqueue("user")
+    try:
+        async for _ in ticket.wait():
+            pass
+        while True:
+            await asyncio.sleep(0.01)
+            yield "frame"
+    finally:
+        ticket.release()
+        released.append(True)
+
+
+async def consume(stream, received):
+    async for frame in stream:
+        received.append(frame)
+
+
+def test_cancelled_consumer_releases_ticket():
+    async def run():
+        scheduler = FairScheduler(concurrency=1, max_queued=4)
+        released, received = [], []
+        stream = until_disconnected(FakeRequest(), ticketed_frames(scheduler, released))
+        consumer = asyncio.create_task(consume(stream, received))
+        while len(received) < 3:
+            await asyncio.sleep(0.005)
+
+        # What the server does when it notices the disconnect itself: the
+        # consumer is cancelled while a step of the frames is pending
+        consumer.cancel()
+        await asyncio.gather(consumer, return_exceptions=True)
+
+        assert consumer.cancelled()
+        assert released == [True]
+        assert scheduler.running == 0
+
+    asyncio.run(run())
+
+
+def test_polled_disconnect_releases_ticket():
+    async def run():
+        scheduler = FairScheduler(concurrency=1, max_queued=4)
+        request = FakeRequest()
+        released, received = [], []
+        stream = until_disconnected(
+            request, ticketed_frames(scheduler, released), poll_interval=0.01
+        )
+        consumer = asyncio.create_task(consume(stream, received))
+        while not received:
+            await asyncio.sleep(0.005)
+
+        request.disconnected = True
+        await asyncio.wait_for(consumer, 1)
+        assert released == [True]
+        assert scheduler.running == 0
+
+    asyncio.run(run())
+
+
+def test_coalesce_closes_upstream_when_reader_is_cancelled():
+    async def run():
+        closed = []
+
+        async def tokens():
+            try:
+                while True:
+                    yield "tok "
+                    await asyncio.sleep(0)
+            finally:
+                closed.append(True)
+
+        async def slow_reader():
+            # Read the way the chat endpoint does
+            async with aclosing(coalesce(tokens(), 1, 4, max_pending=2)) as pieces:
+                async for _ in pieces:
+                    await asyncio.sleep(10)
+
+        reader = asyncio.create_task(slow_reader())
+        # Let the producer fill the bounded queue and block on it
+        await asyncio.sleep(0.05)
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
+
+        assert closed == [True]
+        others = asyncio.all_tasks() - {asyncio.current_task()}
+        assert not others
+
+    asyncio.run(run())
+
+
+def test_coalesce_groups_tokens_and_reraises_errors():
+    async def run():
+        async def tokens():
+            for token in ["a", "b", "c"]:
+                yield token
+            raise ValueError("upstream failed")
+
+        pieces = []
+        try:
+            async for piece in coalesce(tokens(), flush_ms=50, flush_bytes=1024):
+                pieces.append(piece)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("the upstream error was swallowed")
+        assert "".join(pieces) == "abc"
+
+    asyncio.run(run())
@@ -0,0 +1,55 @@
+import hashlib
+import os
+import re
+import uuid
+
+_EXTENSION = re.compile(r"^\.[A-Za-z0-9]{1,10}$")
+
+
+def file_type(filename):
+    """The lower-case extension of an upload's name, extraction picks the
+    parser by it (``""`` when missing or unusable)"""
+    ext = os.path.splitext(filename or "")[1].lower()
+    return ext if _EXTENSION.match(ext) else ""
+
+
+class UploadStore:
+    """Content-addressed storage for uploaded documents.
+
+    Uploads are streamed to disk in fixed-size pieces while their SHA-256
+    is computed, so memory use does not grow with the file. A file is kept
+    as ``<root>/<hh>/<sha256>``: identical uploads share one file whatever
+    they are called, and uploads that merely share a filename no longer
+    overwrite each other. The file type travels with the upload instead
+    (see ``file_type``).
+    """
+
+    def __init__(self, root, chunk_bytes=1024 * 1024):
+        self.root = root
+        self.chunk_bytes = chunk_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, digest):
+        return os.path.join(self.root, digest[:2], digest)
+
+    def save(self, source):
+        """Copy a binary file object into the store, return ``(sha256, path)``"""
+        digest = hashlib.sha256()
+        tmp = os.path.join(self.root, f".{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp, "wb") as out:
+                for piece in iter(lambda: source.read(self.chunk_bytes), b""):
+                    digest.update(piece)
+                    out.write(piece)
+
+            path = self.path(digest.hexdigest())
+            if os.path.exists(path):
+                os.remove(tmp)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return digest.hexdigest(), path
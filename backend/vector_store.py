@@ -0,0 +1,88 @@
+import os
+import threading
+
+import numpy as np
+
+
+class VectorStore:
+    """Append-only float32 copy of every indexed vector.
+
+    Vectors and their IDs are appended to two flat files, so adding a
+    document writes only its own vectors. Reads go through ``np.memmap``,
+    leaving the data in the OS page cache rather than process memory. The
+    index manager rebuilds or retrains indexes from this copy and holds a
+    file lock around appends, so only one process writes at a time.
+    """
+
+    def __init__(self, path):
+        self.vectors_path = f"{path}.f32"
+        self.ids_path = f"{path}.ids"
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        try:
+            return os.path.getsize(self.ids_path) // 8
+        except FileNotFoundError:
+            return 0
+
+    def append(self, vectors, ids):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        ids = np.ascontiguousarray(ids, dtype=np.int64)
+        with self._lock:
+            os.makedirs(os.path.dirname(self.ids_path) or ".", exist_ok=True)
+            self._truncate(vectors.shape[1])
+            with open(self.vectors_path, "ab") as out:
+                out.write(vectors.tobytes())
+            with open(self.ids_path, "ab") as out:
+                out.write(ids.tobytes())
+
+    def _truncate(self, dim):
+        """Cut both files back to the rows they both hold completely.
+
+        A crash between (or during) the two appends leaves the files at
+        different lengths; appending after that would pair every later
+        vector with the wrong ID.
+        """
+        sizes = [
+            os.path.getsize(path) if os.path.exists(path) else 0
+            for path in (self.vectors_path, self.ids_path)
+        ]
+        rows = min(sizes[0] // (4 * dim), sizes[1] // 8)
+        for path, size, row_size in (
+            (self.vectors_path, sizes[0], 4 * dim),
+            (self.ids_path, sizes[1], 8),
+        ):
+            if size > rows * row_size:
+                os.truncate(path, rows * row_size)
+
+    def load(self, dim):
+        """Return memory-mapped ``(vectors, ids)`` arrays (``None`` if empty)"""
+        count = len(self)
+        if not count:
+            return None
+        # A crash between the two appends can leave one file ahead
+        count = min(count, os.path.getsize(self.vectors_path) // (4 * dim))
+        vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(count, dim))
+        ids = np.memmap(self.ids_path, dtype=np.int64, mode="r", shape=(count,))
+        return vectors, ids
+
+    def find(self, ids, dim):
+        """Return ``(found, vectors)``: a mask of the IDs that have a stored
+        vector, and those vectors in the same order"""
+        ids = np.asarray(ids, dtype=np.int64)
+        loaded = self.load(dim)
+        if loaded is None or not len(ids):
+            return np.zeros(len(ids), dtype=bool), np.empty((0, dim), dtype=np.float32)
+        vectors, stored_ids = loaded
+        # Chunk IDs are handed out in increasing order, so the ID file is sorted
+        rows = np.searchsorted(stored_ids, ids)
+        rows = np.clip(rows, 0, len(stored_ids) - 1)
+        found = stored_ids[rows] == ids
+        return found, np.asarray(vectors[rows[found]])
+
+    def lookup(self, ids, dim):
+        """Return the stored vectors for the given IDs, in the same order"""
+        found, vectors = self.find(ids, dim)
+        if not found.all():
+            raise KeyError("Vector store has no entry for some IDs")
+        return vectors
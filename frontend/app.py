@@ -69,8 +69,12 @@ def load_session(session_id: str):
     st.session_state.messages = [] # Placeholder for DB load
     # st.session_state.messages = run_async(db.load_session_messages(session_id))
 
-def send_message(message: str, stream: bool = True) -> Tuple[str, float]:
-    """Send message to the RAG API and get response"""
+def send_message(message: str, stream: bool = True, on_queue=None) -> Tuple[str, float]:
+    """Send message to the RAG API and get response.
+
+    ``on_queue`` is called with the queue position while the request waits
+    for a free model slot.
+    """
     start_time = time.perf_counter()
 
     api_messages = []
@@ -120,6 +124,8 @@ def send_message(message: str, stream: bool = True) -> Tuple[str, float]:
                                     full_response += content
                             elif 'error' in chunk:
                                 full_response += f"\nError: {chunk['error']}"
+                            elif 'queue' in chunk and on_queue:
+                                on_queue(chunk['queue']['position'])
                         except json.JSONDecodeError:
                             pass
 
@@ -137,6 +143,11 @@ def send_message(message: str, stream: bool = True) -> Tuple[str, float]:
     except requests.exceptions.Timeout:
         elapsed = time.perf_counter() - start_time
         return f"Error: Request timeout. The backend took too long to respond.", elapsed
+    except requests.exceptions.HTTPError as e:
+        elapsed = time.perf_counter() - start_time
+        if e.response is not None and e.response.status_code == 429:
+            return "The model is busy right now. Please try again in a moment.", elapsed
+        return f"Error: {str(e)}", elapsed
     except requests.exceptions.ConnectionError:
         elapsed = time.perf_counter() - start_time
         return f"Error: Unable to connect to RAG API. Make sure the backend is running on {API_BASE_URL}", elapsed
@@ -144,6 +155,27 @@ def send_message(message: str, stream: bool = True) -> Tuple[str, float]:
         elapsed = time.perf_counter() - start_time
         return f"Error: {str(e)}", elapsed
 
+def wait_for_ingest(job_id: str, poll_interval: float = 1.0) -> dict:
+    """Poll a background ingest job until it finishes, showing progress"""
+    progress = st.progress(0.0, text="Queued...")
+    while True:
+        response = requests.get(f"{API_BASE_URL}/v1/ingest/{job_id}", timeout=10)
+        response.raise_for_status()
+        job = response.json()
+
+        finished = job["files_done"] + job["files_failed"]
+        current = next((f for f in job["files"] if f["stage"] not in ("done", "failed")), None)
+        label = f"{current['name']}: {current['stage']}" if current else job["status"]
+        progress.progress(finished / max(job["files_total"], 1), text=f"{label} ({job['chunks_total']} chunks)")
+
+        if job["status"] in ("done", "failed"):
+            progress.empty()
+            for f in job["files"]:
+                if f["error"]:
+                    st.warning(f"{f['name']}: {f['error']}")
+            return job
+        time.sleep(poll_interval)
+
 def process_user_message(message: str):
     """Process a user message and get response"""
     if st.session_state.processing: return
@@ -158,7 +190,10 @@ def process_user_message(message: str):
         with status_placeholder.container():
             st.info("🔍 Retrieving context and generating answer...")
             
-        response, elapsed_time = send_message(message, stream=True)
+        def show_queue(position):
+            status_placeholder.info(f"⏳ Waiting for the model (position {position} in queue)...")
+
+        response, elapsed_time = send_message(message, stream=True, on_queue=show_queue)
         status_placeholder.empty()
 
         st.session_state.messages.append({
@@ -639,16 +674,30 @@ with st.sidebar:
                     upload_response = requests.post(
                         f"{API_BASE_URL}/v1/ingest", 
                         files=files_payload,
-                        data={"session_id": st.session_state.session_id}
+                        data={"session_id": st.session_state.session_id},
+                        headers={"X-OpenWebUI-User-Id": st.session_state.user_id}
                     )
                     upload_response.raise_for_status()
-                    
-                    st.success(f"Successfully processed {len(uploaded_files)} documents!")
-                    time.sleep(1)
-                    st.rerun()
-                    
+                    job_id = upload_response.json()["job_id"]
                 except Exception as e:
                     st.error(f"Upload failed: {str(e)}")
+                    job_id = None
+
+            # 3. Poll ingestion progress instead of blocking on one request
+            if job_id:
+                try:
+                    job = wait_for_ingest(job_id)
+                    if job["status"] == "done":
+                        skipped = job.get("files_duplicate", 0)
+                        note = f" ({skipped} already indexed)" if skipped else ""
+                        st.success(f"Successfully processed {job['files_done']} documents!{note}")
+                        time.sleep(1)
+                        st.rerun()
+                    else:
+                        st.error("Ingestion failed for all documents.")
+                    
+                except Exception as e:
+                    st.error(f"Could not track ingestion: {str(e)}")
     
     st.markdown("---")
 